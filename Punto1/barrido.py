@@ -0,0 +1,100 @@
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cache_resultados import CacheResultados
+from perceptron import AgentePerceptron, entrenar_sin_interfaz
+
+COLUMNAS = [
+    "tasa_aprendizaje", "max_iteraciones", "n_puntos", "semilla", "estrategia",
+    "iteraciones", "convergio", "detenido_temprano", "precision_entrenamiento", "precision_prueba",
+    "peso1", "peso2", "sesgo", "tiempo_segundos", "tiempo_total_segundos",
+]
+
+def ejecutar_corrida(configuracion):
+    """Entrenar un ModeloPerceptron independiente (se ejecuta en un proceso del pool)"""
+    (tasa_aprendizaje, max_iteraciones, n_puntos, semilla, estrategia,
+     n_prueba, paciencia, ruido, directorio_cache) = configuracion
+    inicio = time.perf_counter()
+
+    # Cada modelo usa sus propios generadores, sembrados con la semilla de la corrida;
+    # la caché se comparte entre procesos (las escrituras son atómicas)
+    cache = CacheResultados(directorio_cache) if directorio_cache else None
+    metricas = entrenar_sin_interfaz(n_puntos, tasa_aprendizaje, max_iteraciones, n_prueba,
+                                     estrategia=estrategia, paciencia=paciencia, ruido=ruido,
+                                     semilla=semilla, cache=cache)
+
+    metricas["semilla"] = semilla
+    metricas["tiempo_total_segundos"] = time.perf_counter() - inicio
+    return metricas
+
+def ejecutar_barrido(tasas, iteraciones, tamanos, semillas, n_prueba=100, procesos=None,
+                     estrategias=("fija",), paciencia=None, ruido=0.0, directorio_cache=None):
+    """Ejecutar todas las combinaciones en un pool de procesos y devolver una tabla columnar"""
+    configuraciones = [
+        (tasa, max_iter, n_puntos, semilla, estrategia, n_prueba, paciencia, ruido, directorio_cache)
+        for tasa, max_iter, n_puntos, semilla, estrategia
+        in itertools.product(tasas, iteraciones, tamanos, semillas, estrategias)
+    ]
+    procesos = procesos or os.cpu_count() or 1
+    tamano_bloque = max(1, len(configuraciones) // (procesos * 4))
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        resultados = list(pool.map(ejecutar_corrida, configuraciones, chunksize=tamano_bloque))
+
+    return {columna: np.array([r[columna] for r in resultados]) for columna in COLUMNAS}
+
+def guardar_tabla(tabla, ruta):
+    """Guardar la tabla en CSV o, si la ruta termina en .npz, en formato columnar comprimido"""
+    if ruta.endswith(".npz"):
+        np.savez_compressed(ruta, **tabla)
+        return
+
+    with open(ruta, "w", newline="") as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(COLUMNAS)
+        escritor.writerows(zip(*(tabla[columna].tolist() for columna in COLUMNAS)))
+
+def cargar_tabla(ruta):
+    """Cargar una tabla columnar guardada con guardar_tabla en formato .npz"""
+    with np.load(ruta) as datos:
+        return {columna: datos[columna] for columna in datos.files}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Barrido paralelo de hiperparámetros del perceptrón")
+    parser.add_argument("--tasas", type=float, nargs="+", default=[0.01, 0.1, 0.5])
+    parser.add_argument("--iteraciones", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--puntos", type=int, nargs="+", default=[30, 1000])
+    parser.add_argument("--semillas", type=int, nargs="+", default=list(range(5)))
+    parser.add_argument("--estrategias", nargs="+", default=["fija"],
+                        choices=AgentePerceptron.ESTRATEGIAS)
+    parser.add_argument("--paciencia", type=int, default=None, help="parada temprana por estancamiento")
+    parser.add_argument("--ruido", type=float, default=0.0, help="fracción de etiquetas invertidas")
+    parser.add_argument("--prueba", type=int, default=100, help="puntos de prueba por corrida")
+    parser.add_argument("--procesos", type=int, default=None, help="procesos del pool (por defecto, todos los núcleos)")
+    parser.add_argument("--salida", default="barrido.csv", help="archivo .csv o .npz")
+    parser.add_argument("--cache", metavar="DIRECTORIO", help="reutilizar corridas ya entrenadas")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    tabla = ejecutar_barrido(args.tasas, args.iteraciones, args.puntos, args.semillas,
+                             args.prueba, args.procesos, args.estrategias, args.paciencia, args.ruido,
+                             args.cache)
+    guardar_tabla(tabla, args.salida)
+
+    print(f"{len(tabla['semilla'])} corridas en {time.perf_counter() - inicio:.2f} s -> {args.salida}")
+
+    # Resumen por estrategia: épocas y tiempo medios, para elegir la más barata
+    for estrategia in args.estrategias:
+        filas = tabla["estrategia"] == estrategia
+        print(f"{estrategia}: {tabla['iteraciones'][filas].mean():.1f} épocas, "
+              f"{tabla['tiempo_segundos'][filas].mean():.4f} s, "
+              f"precisión de prueba {tabla['precision_prueba'][filas].mean():.1f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from perceptron import ModeloPerceptron, MotorEntrenamiento, PerceptronMulticlase
+
+FASES = ("generacion", "epoca", "convergencia", "precision", "visualizacion")
+
+# Campos que identifican un resultado al compararlo con la base
+CAMPOS_COMPARACION = ("fase", "n_puntos", "dimension")
+
+# cronometrar y comparar son idénticas en Punto1/benchmark.py y Punto2/benchmark.py
+# (los dos proyectos no comparten módulos): un cambio en una va también en la otra
+def cronometrar(funcion, repeticiones=5, preparar=None):
+    """Mejor tiempo (en segundos) de varias ejecuciones de funcion(); preparar() no se mide"""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        if preparar is not None:
+            preparar()
+        gc.collect()
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+def medir_fases(n_puntos, repeticiones=5, semilla=0, max_visualizacion=100_000):
+    """Tiempo de cada fase de ModeloPerceptron para un tamaño de datos"""
+    modelo = ModeloPerceptron(n_puntos=n_puntos, verboso=False, semilla=semilla)
+    perceptron = modelo.perceptron
+    pesos_iniciales, sesgo_inicial = perceptron.pesos.copy(), perceptron.sesgo
+
+    def reiniciar_pesos():
+        perceptron.pesos, perceptron.sesgo = pesos_iniciales.copy(), sesgo_inicial
+        perceptron.invalidar_cache()
+
+    tiempos = {
+        "generacion": cronometrar(
+            lambda: modelo.agente_datos.generar_datos_entrenamiento(n_puntos), repeticiones),
+        "epoca": cronometrar(perceptron.entrenar_epoca, repeticiones, reiniciar_pesos),
+    }
+
+    # La convergencia se mide en el estado que deja una época: sólo el tramo
+    # desactualizado de la caché se vuelve a evaluar
+    reiniciar_pesos()
+    perceptron.entrenar_epoca()
+    pendiente = perceptron.cache_pendiente
+    tiempos["convergencia"] = cronometrar(
+        perceptron.verificar_convergencia, repeticiones,
+        lambda: setattr(perceptron, "cache_pendiente", pendiente))
+
+    datos_prueba = modelo.agente_datos.generar_datos_prueba(n_puntos)
+    tiempos["precision"] = cronometrar(lambda: perceptron.calcular_precision(datos_prueba), repeticiones)
+
+    if n_puntos <= max_visualizacion:
+        import matplotlib
+        matplotlib.use("Agg")
+        modelo.configurar_visualizacion()
+        modelo.fig.canvas.draw()
+        modelo.puntos.actualizar_predicciones(perceptron.predecir_conjunto(modelo.motor))
+        tiempos["visualizacion"] = cronometrar(modelo.actualizar_visualizacion, repeticiones)
+        import matplotlib.pyplot as plt
+        plt.close(modelo.fig)
+
+    return [
+        {"fase": fase, "n_puntos": n_puntos, "segundos": segundos,
+         "puntos_por_segundo": n_puntos / segundos if segundos else None}
+        for fase, segundos in tiempos.items()
+    ]
+
+def medir_dimensiones(dimensiones, n_puntos=100_000, n_clases=10, repeticiones=5, semilla=0):
+    """Throughput (puntos/s) de predicción y entrenamiento a medida que crece la dimensión"""
+    rng = np.random.default_rng(semilla)
+    resultados = []
+    for d in dimensiones:
+        caracteristicas = rng.uniform(-1, 1, size=(n_puntos, d))
+        normal = rng.uniform(-1, 1, size=d)
+        etiquetas = np.where(caracteristicas @ normal >= 0, 1, -1)
+        motor = MotorEntrenamiento(caracteristicas, etiquetas)
+        pesos = rng.uniform(-1, 1, size=d)
+
+        clases = np.argmax(caracteristicas @ rng.uniform(-1, 1, size=(d, n_clases)), axis=1)
+        multiclase = PerceptronMulticlase(d, range(n_clases))
+
+        tiempos = {
+            "prediccion": cronometrar(lambda: motor.predecir(pesos, 0.0), repeticiones),
+            "epoca_lotes": cronometrar(lambda: motor.epoca_lotes(pesos, 0.0, 0.1, 1024), repeticiones),
+            "prediccion_multiclase": cronometrar(lambda: multiclase.predecir(caracteristicas), repeticiones),
+            "epoca_multiclase": cronometrar(
+                lambda: multiclase.entrenar_epoca(caracteristicas, clases, 1024), repeticiones),
+        }
+        for fase, segundos in tiempos.items():
+            resultados.append({
+                "fase": fase,
+                "dimension": d,
+                "n_puntos": n_puntos,
+                "segundos": segundos,
+                "puntos_por_segundo": n_puntos / segundos,
+            })
+    return resultados
+
+def comparar(resultados, base, umbral, minimo_segundos=1e-4, campos=("fase",)):
+    """Resultados más lentos que la base en más de `umbral` (fracción), emparejados por `campos`.
+
+    Las diferencias menores que minimo_segundos se consideran ruido de medición.
+    """
+    def clave(r):
+        return tuple(r.get(campo) for campo in campos)
+
+    tiempos_base = {clave(r): r["segundos"] for r in base["resultados"]}
+    regresiones = []
+    for resultado in resultados:
+        anterior = tiempos_base.get(clave(resultado))
+        diferencia = resultado["segundos"] - (anterior or 0)
+        if anterior and diferencia > anterior * umbral and diferencia > minimo_segundos:
+            regresiones.append({**resultado, "segundos_base": anterior,
+                                "variacion": resultado["segundos"] / anterior - 1})
+    return regresiones
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del perceptrón")
+    parser.add_argument("suite", nargs="?", choices=["fases", "dimensiones"], default="fases")
+    parser.add_argument("--exponentes", type=int, nargs="+", default=[2, 3, 4, 5, 6, 7],
+                        help="tamaños 10^k de datos para la suite de fases")
+    parser.add_argument("--max-visualizacion", type=int, default=100_000,
+                        help="tamaño máximo al que se mide la actualización de la visualización")
+    parser.add_argument("--dimensiones", type=int, nargs="+", default=[2, 10, 50, 100, 250, 500])
+    parser.add_argument("--puntos", type=int, default=100_000, help="puntos para la suite de dimensiones")
+    parser.add_argument("--clases", type=int, default=10)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="guardar los resultados en un archivo JSON")
+    parser.add_argument("--comparar", metavar="BASE", help="JSON de una corrida anterior")
+    parser.add_argument("--umbral", type=float, default=0.2,
+                        help="fracción de enlentecimiento tolerada frente a la base")
+    parser.add_argument("--minimo", type=float, default=1e-4,
+                        help="diferencia absoluta (s) por debajo de la cual no hay regresión")
+    args = parser.parse_args(argv)
+
+    if args.suite == "fases":
+        resultados = []
+        for exponente in args.exponentes:
+            resultados.extend(medir_fases(10 ** exponente, args.repeticiones, args.semilla,
+                                          args.max_visualizacion))
+    else:
+        resultados = medir_dimensiones(args.dimensiones, args.puntos, args.clases,
+                                       args.repeticiones, args.semilla)
+
+    informe = {
+        "suite": args.suite,
+        "metadatos": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "maquina": platform.machine(),
+            "semilla": args.semilla,
+            "repeticiones": args.repeticiones,
+        },
+        "resultados": resultados,
+    }
+    if args.salida:
+        with open(args.salida, "w") as archivo:
+            json.dump(informe, archivo, indent=2)
+    else:
+        for resultado in resultados:
+            print(json.dumps(resultado))
+
+    if args.comparar:
+        with open(args.comparar) as archivo:
+            regresiones = comparar(resultados, json.load(archivo), args.umbral, args.minimo,
+                                   CAMPOS_COMPARACION)
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion['fase']} n={regresion['n_puntos']}: "
+                  f"{regresion['segundos_base']:.6f} s -> {regresion['segundos']:.6f} s "
+                  f"(+{regresion['variacion']:.0%})", file=sys.stderr)
+        if regresiones:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+RUTA_CODIGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perceptron.py")
+
+def version_codigo(ruta=RUTA_CODIGO):
+    """Huella del código de entrenamiento: un cambio en él invalida las entradas anteriores"""
+    with open(ruta, "rb") as archivo:
+        return hashlib.sha256(archivo.read()).hexdigest()[:16]
+
+class CacheResultados:
+    """Caché en disco de corridas de entrenamiento, direccionada por contenido.
+
+    Cada corrida se guarda en <clave>.npz con los pesos finales, el historial y
+    las métricas (en JSON). La clave es el SHA-256 de la configuración más la
+    versión del código. Cuando el directorio supera max_bytes se borran las
+    entradas usadas hace más tiempo (cada acierto actualiza su fecha de acceso).
+    """
+
+    def __init__(self, directorio, max_bytes=256 * 2**20, version=None):
+        os.makedirs(directorio, exist_ok=True)
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.version = version or version_codigo()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def clave(self, **configuracion):
+        texto = json.dumps({**configuracion, "version": self.version}, sort_keys=True)
+        return hashlib.sha256(texto.encode()).hexdigest()
+
+    def ruta(self, clave):
+        return os.path.join(self.directorio, f"{clave}.npz")
+
+    def obtener(self, clave):
+        """(metricas, historial) guardados para la clave, o None si no están"""
+        ruta = self.ruta(clave)
+        try:
+            with np.load(ruta) as datos:
+                metricas = json.loads(str(datos["metricas"]))
+                historial = {c[len("historial_"):]: datos[c] for c in datos.files
+                             if c.startswith("historial_")}
+        except (FileNotFoundError, ValueError, OSError):
+            self.fallos += 1
+            return None
+        os.utime(ruta)
+        self.aciertos += 1
+        return metricas, historial
+
+    def guardar(self, clave, metricas, historial):
+        """Guardar una corrida; la escritura es atómica para poder compartir el directorio"""
+        ruta = self.ruta(clave)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "wb") as archivo:
+            np.savez_compressed(archivo, metricas=json.dumps(metricas),
+                                **{f"historial_{c}": v for c, v in historial.items()})
+        os.replace(temporal, ruta)
+        self.desalojar()
+
+    def desalojar(self):
+        """Borrar las entradas menos recientes hasta quedar dentro de max_bytes"""
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            if not nombre.endswith(".npz"):
+                continue
+            try:
+                estado = os.stat(os.path.join(self.directorio, nombre))
+            except FileNotFoundError:
+                continue
+            entradas.append((estado.st_mtime, estado.st_size, nombre))
+
+        total = sum(tamano for _, tamano, _ in entradas)
+        for _, tamano, nombre in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directorio, nombre))
+                self.desalojos += 1
+            except FileNotFoundError:
+                pass  # Otro proceso ya la borró
+            total -= tamano
+
+    def estadisticas(self):
+        return {"aciertos": self.aciertos, "fallos": self.fallos, "desalojos": self.desalojos}
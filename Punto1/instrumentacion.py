@@ -0,0 +1,135 @@
+import json
+import sys
+
+import mesa
+import numpy as np
+
+# Niveles de los mensajes de progreso, de más a menos detallado
+NIVELES = ("depuracion", "info", "aviso")
+
+class Instrumentacion:
+    """Reparte los eventos de entrenamiento entre varios sumideros.
+
+    Los eventos son diccionarios de tres tipos: "fase" (tiempo de una fase del
+    paso), "epoca" (errores y cambio de los pesos) y "mensaje" (texto con nivel).
+    """
+
+    def __init__(self, *sumideros):
+        self.sumideros = list(sumideros)
+
+    def agregar(self, sumidero):
+        self.sumideros.append(sumidero)
+        return sumidero
+
+    def registrar(self, tipo, datos):
+        for sumidero in self.sumideros:
+            sumidero.registrar(tipo, datos)
+
+    def fase(self, fase, segundos, iteracion):
+        self.registrar("fase", {"fase": fase, "segundos": segundos, "iteracion": iteracion})
+
+    def epoca(self, iteracion, errores, precision, delta_pesos, delta_sesgo):
+        self.registrar("epoca", {
+            "iteracion": iteracion,
+            "errores": errores,
+            "precision": precision,
+            "delta_pesos": delta_pesos,
+            "delta_sesgo": delta_sesgo,
+        })
+
+    def mensaje(self, nivel, texto):
+        self.registrar("mensaje", {"nivel": nivel, "texto": texto})
+
+    def cerrar(self):
+        for sumidero in self.sumideros:
+            cerrar = getattr(sumidero, "cerrar", None)
+            if cerrar is not None:
+                cerrar()
+
+class SumideroMemoria:
+    """Guarda los eventos en listas por tipo"""
+
+    def __init__(self):
+        self.eventos = {"fase": [], "epoca": [], "mensaje": []}
+
+    def registrar(self, tipo, datos):
+        self.eventos[tipo].append(datos)
+
+    def como_arreglos(self, tipo="epoca"):
+        """Eventos de un tipo como tabla columnar de arreglos numpy"""
+        eventos = self.eventos[tipo]
+        if not eventos:
+            return {}
+        return {clave: np.array([e[clave] for e in eventos]) for clave in eventos[0]}
+
+    def resumen_fases(self):
+        """Tiempo total, medio y número de mediciones de cada fase"""
+        resumen = {}
+        for evento in self.eventos["fase"]:
+            fase = resumen.setdefault(evento["fase"], {"total": 0.0, "mediciones": 0})
+            fase["total"] += evento["segundos"]
+            fase["mediciones"] += 1
+        for fase in resumen.values():
+            fase["media"] = fase["total"] / fase["mediciones"]
+        return resumen
+
+class SumideroDataCollector:
+    """Puente hacia mesa.DataCollector: una fila de modelo por época registrada.
+
+    Los tiempos de fase se acumulan hasta la siguiente época y se reportan como
+    columnas "segundos_<fase>"; las fases que envuelven al entrenamiento
+    (planificador) terminan después de la época y aparecen en la fila siguiente.
+    """
+
+    COLUMNAS_EPOCA = ("iteracion", "errores", "precision", "delta_pesos", "delta_sesgo")
+
+    def __init__(self, modelo, fases=("entrenamiento",)):
+        self.modelo = modelo
+        self.ultima_epoca = {}
+        self.tiempos = {}
+        reporteros = {columna: self._reportero_epoca(columna) for columna in self.COLUMNAS_EPOCA}
+        reporteros.update({f"segundos_{fase}": self._reportero_fase(fase) for fase in fases})
+        self.recolector = mesa.DataCollector(model_reporters=reporteros)
+
+    def _reportero_epoca(self, columna):
+        return lambda modelo: self.ultima_epoca.get(columna)
+
+    def _reportero_fase(self, fase):
+        return lambda modelo: self.tiempos.get(fase, 0.0)
+
+    def registrar(self, tipo, datos):
+        if tipo == "fase":
+            self.tiempos[datos["fase"]] = self.tiempos.get(datos["fase"], 0.0) + datos["segundos"]
+        elif tipo == "epoca":
+            self.ultima_epoca = datos
+            self.recolector.collect(self.modelo)
+            self.tiempos = {}
+
+    def tabla(self):
+        """Variables de modelo recolectadas (DataFrame de pandas)"""
+        return self.recolector.get_model_vars_dataframe()
+
+class SumideroJSONL:
+    """Escribe cada evento como una línea JSON con su tipo"""
+
+    def __init__(self, ruta):
+        self.archivo = open(ruta, "w")
+
+    def registrar(self, tipo, datos):
+        self.archivo.write(json.dumps({"tipo": tipo, **datos}) + "\n")
+
+    def cerrar(self):
+        self.archivo.close()
+
+class SumideroConsola:
+    """Imprime los mensajes de progreso con nivel igual o superior al configurado"""
+
+    def __init__(self, nivel="info", salida=None):
+        if nivel not in NIVELES:
+            raise ValueError(f"Nivel desconocido: {nivel}")
+        self.minimo = NIVELES.index(nivel)
+        self.salida = salida or sys.stdout
+
+    def registrar(self, tipo, datos):
+        if tipo == "mensaje" and NIVELES.index(datos["nivel"]) >= self.minimo:
+            print(datos["texto"], file=self.salida)
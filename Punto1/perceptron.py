@@ -1,65 +1,619 @@
 import mesa
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.widgets import Slider, Button
-import random
+import argparse
+import json
+import time
+from collections import namedtuple
+
+from cache_resultados import CacheResultados
+from instrumentacion import Instrumentacion, SumideroConsola, SumideroJSONL, NIVELES
+
+def _pyplot():
+    """Importar matplotlib sólo cuando se solicita visualización"""
+    import matplotlib.pyplot as plt
+    return plt
+
+class MotorEntrenamiento:
+    """Motor de entrenamiento vectorizado sobre arreglos NumPy contiguos"""
+    BLOQUE_MINIMO = 64
+    BLOQUE_MAXIMO = 65536
+
+    def __init__(self, caracteristicas, etiquetas):
+        self.caracteristicas = np.ascontiguousarray(caracteristicas, dtype=np.float64)
+        self.etiquetas = np.ascontiguousarray(etiquetas, dtype=np.int64)
+        # Puntos evaluados en total (para perfilar cuántas pasadas se hacen por época)
+        self.evaluaciones = 0
+        # Índice del último punto que modificó los pesos en la última época (-1 si ninguno)
+        self.ultima_actualizacion = -1
+
+    @classmethod
+    def desde_puntos(cls, puntos):
+        """Construir el motor a partir de un ConjuntoPuntos o de objetos con x, y y etiqueta_real"""
+        if isinstance(puntos, ConjuntoPuntos):
+            # Comparte los arreglos del conjunto sin copiarlos
+            return cls(puntos.caracteristicas, puntos.etiquetas_reales)
+        caracteristicas = np.array([(p.x, p.y) for p in puntos], dtype=np.float64).reshape(-1, 2)
+        etiquetas = np.array([p.etiqueta_real for p in puntos], dtype=np.int64)
+        return cls(caracteristicas, etiquetas)
+
+    def __len__(self):
+        return len(self.etiquetas)
+
+    # Hasta esta dimensión la suma se acumula columna a columna, con el mismo
+    # orden de operaciones que AgentePerceptron.predecir; por encima, un único
+    # producto matriz-vector
+    DIMENSION_EXPLICITA = 2
+
+    def suma_ponderada(self, pesos, sesgo, inicio=0, fin=None):
+        """Calcular w·x + b para el rango [inicio, fin)"""
+        bloque = self.caracteristicas[inicio:fin]
+        self.evaluaciones += len(bloque)
+        if bloque.shape[1] > self.DIMENSION_EXPLICITA:
+            return bloque @ np.asarray(pesos, dtype=np.float64) + sesgo
+        suma = bloque[:, 0] * pesos[0]
+        for j in range(1, bloque.shape[1]):
+            suma += bloque[:, j] * pesos[j]
+        suma += sesgo
+        return suma
+
+    def predecir(self, pesos, sesgo, inicio=0, fin=None):
+        """Predicciones (1 o -1) para el rango [inicio, fin)"""
+        return np.where(self.suma_ponderada(pesos, sesgo, inicio, fin) >= 0, 1, -1)
+
+    def mascara_errores(self, pesos, sesgo):
+        """Máscara booleana de puntos mal clasificados"""
+        return self.predecir(pesos, sesgo) != self.etiquetas
+
+    def contar_errores(self, pesos, sesgo):
+        return int(np.count_nonzero(self.mascara_errores(pesos, sesgo)))
+
+    def precision(self, pesos, sesgo):
+        """Porcentaje de puntos bien clasificados"""
+        if len(self) == 0:
+            return 0.0
+        return (len(self) - self.contar_errores(pesos, sesgo)) / len(self) * 100
+
+    def reordenado(self, orden):
+        """Copia del motor con los puntos en el orden dado"""
+        return MotorEntrenamiento(self.caracteristicas[orden], self.etiquetas[orden])
+
+    def epoca_secuencial(self, pesos, sesgo, tasa_aprendizaje, predicciones=None, acumulado=None):
+        """Aplicar la regla del perceptrón punto por punto, en orden.
+
+        Produce exactamente los mismos pesos que el recorrido punto a punto:
+        los tramos sin errores se evalúan por bloques y sólo se detiene en
+        cada punto mal clasificado para actualizar. Si se pasa el arreglo
+        predicciones, se guardan en él las de los tramos sin errores; las
+        posteriores a ultima_actualizacion quedan válidas para los pesos finales.
+        Si se pasa acumulado ([Σw, Σb]), se le suman los pesos vigentes tras
+        procesar cada punto (perceptrón promediado).
+        """
+        pesos = np.array(pesos, dtype=np.float64)
+        n = len(self)
+        self.ultima_actualizacion = -1
+        errores = 0
+        inicio_tramo = 0
+        inicio = 0
+        tamano = self.BLOQUE_MINIMO
+        while inicio < n:
+            fin = min(inicio + tamano, n)
+            prediccion = self.predecir(pesos, sesgo, inicio, fin)
+            mal_clasificados = np.flatnonzero(prediccion != self.etiquetas[inicio:fin])
+            if mal_clasificados.size == 0:
+                if predicciones is not None:
+                    predicciones[inicio:fin] = prediccion
+                inicio = fin
+                tamano = min(tamano * 2, self.BLOQUE_MAXIMO)
+                continue
+
+            desplazamiento = int(mal_clasificados[0])
+            indice = inicio + desplazamiento
+            error = int(self.etiquetas[indice]) - int(prediccion[desplazamiento])
+            errores += 1
+            if acumulado is not None:
+                acumulado[:-1] += pesos * (indice - inicio_tramo)
+                acumulado[-1] += sesgo * (indice - inicio_tramo)
+                inicio_tramo = indice
+            paso = tasa_aprendizaje * error
+            pesos += paso * self.caracteristicas[indice]
+            sesgo += paso
+            self.ultima_actualizacion = indice
+            inicio = indice + 1
+            # Ajustar el bloque a la distancia observada entre errores
+            tamano = min(max(desplazamiento + 1, self.BLOQUE_MINIMO), self.BLOQUE_MAXIMO)
+
+        if acumulado is not None:
+            acumulado[:-1] += pesos * (n - inicio_tramo)
+            acumulado[-1] += sesgo * (n - inicio_tramo)
+        return pesos, sesgo, errores
+
+    def epoca_lotes(self, pesos, sesgo, tasa_aprendizaje, tamano_lote=None, predicciones=None,
+                    acumulado=None):
+        """Aplicar la regla del perceptrón por mini-lotes (actualización vectorizada).
+
+        Cada lote se evalúa con los pesos vigentes al inicio del lote y la
+        actualización acumula los errores de todo el lote. Con tamano_lote=None
+        se usa el conjunto completo (batch). predicciones y acumulado se usan
+        igual que en epoca_secuencial, con los pesos vigentes tras cada lote.
+        """
+        pesos = np.array(pesos, dtype=np.float64)
+        n = len(self)
+        tamano_lote = tamano_lote or max(n, 1)
+        self.ultima_actualizacion = -1
+        errores = 0
+        for inicio in range(0, n, tamano_lote):
+            fin = min(inicio + tamano_lote, n)
+            prediccion = self.predecir(pesos, sesgo, inicio, fin)
+            if predicciones is not None:
+                predicciones[inicio:fin] = prediccion
+            error = self.etiquetas[inicio:fin] - prediccion
+            mal_clasificados = np.count_nonzero(error)
+            if mal_clasificados:
+                errores += int(mal_clasificados)
+                self.ultima_actualizacion = fin - 1
+                pesos += tasa_aprendizaje * (error @ self.caracteristicas[inicio:fin])
+                sesgo += tasa_aprendizaje * float(error.sum())
+            if acumulado is not None:
+                acumulado[:-1] += pesos * (fin - inicio)
+                acumulado[-1] += sesgo * (fin - inicio)
+
+        return pesos, sesgo, errores
+
+class PerceptronMulticlase:
+    """Perceptrón uno-contra-todos: una fila de pesos por clase en una matriz (k, d)"""
+    def __init__(self, n_caracteristicas, clases, tasa_aprendizaje=0.1, generador=None):
+        generador = generador if generador is not None else np.random
+        self.clases = np.asarray(clases)
+        self.pesos = generador.uniform(-1, 1, size=(len(self.clases), n_caracteristicas))
+        self.sesgos = generador.uniform(-1, 1, size=len(self.clases))
+        self.tasa_aprendizaje = tasa_aprendizaje
+        self.iteracion_actual = 0
+
+    def puntajes(self, caracteristicas):
+        """w_k·x + b_k para todas las clases, con un único producto matricial"""
+        return caracteristicas @ self.pesos.T + self.sesgos
+
+    def predecir(self, caracteristicas):
+        return self.clases[np.argmax(self.puntajes(caracteristicas), axis=1)]
+
+    def precision(self, caracteristicas, etiquetas):
+        if len(etiquetas) == 0:
+            return 0.0
+        return float(np.mean(self.predecir(caracteristicas) == etiquetas)) * 100
+
+    def entrenar_epoca(self, caracteristicas, etiquetas, tamano_lote=None):
+        """Aplicar la regla del perceptrón a los k clasificadores binarios a la vez.
+
+        Cada lote se evalúa con los pesos vigentes al inicio del lote; con
+        tamano_lote=1 se obtiene la regla secuencial clásica. Devuelve el
+        número de decisiones binarias erróneas de la época.
+        """
+        caracteristicas = np.asarray(caracteristicas, dtype=np.float64)
+        n = len(caracteristicas)
+        tamano_lote = tamano_lote or max(n, 1)
+        errores = 0
+        for inicio in range(0, n, tamano_lote):
+            bloque = caracteristicas[inicio:inicio + tamano_lote]
+            objetivo = np.where(etiquetas[inicio:inicio + tamano_lote, None] == self.clases, 1, -1)
+            prediccion = np.where(self.puntajes(bloque) >= 0, 1, -1)
+            error = objetivo - prediccion
+            errores += int(np.count_nonzero(error))
+            self.pesos += self.tasa_aprendizaje * (error.T @ bloque)
+            self.sesgos += self.tasa_aprendizaje * error.sum(axis=0)
+        self.iteracion_actual += 1
+        return errores
+
+    def entrenar(self, caracteristicas, etiquetas, max_iteraciones=100, tamano_lote=None):
+        """Entrenar hasta que ningún clasificador binario cometa errores o agotar iteraciones"""
+        for _ in range(max_iteraciones):
+            if self.entrenar_epoca(caracteristicas, etiquetas, tamano_lote) == 0:
+                return True
+        return False
+
+class EnsamblePerceptrones:
+    """K perceptrones binarios independientes entrenados a la vez sobre los mismos datos.
+
+    Los pesos se guardan en una matriz (K, d+1) cuya última columna es el sesgo.
+    En modo secuencial cada punto se presenta a todos los modelos a la vez y
+    cada fila sigue exactamente la misma trayectoria que un AgentePerceptron
+    con esos pesos iniciales (en modo lotes, salvo el redondeo del producto
+    matricial); los modelos que convergen dejan de entrenarse.
+    """
+    def __init__(self, n_modelos, n_caracteristicas, tasa_aprendizaje=0.1, pesos=None, generador=None):
+        if pesos is None:
+            generador = generador if generador is not None else np.random
+            pesos = generador.uniform(-1, 1, size=(n_modelos, n_caracteristicas + 1))
+        self.pesos = np.array(pesos, dtype=np.float64)
+        self.tasa_aprendizaje = tasa_aprendizaje
+        self.iteracion_actual = 0
+        self.activos = np.ones(len(self.pesos), dtype=bool)
+        # Época en que convergió cada modelo (-1 si todavía no)
+        self.epocas_convergencia = np.full(len(self.pesos), -1, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.pesos)
+
+    @staticmethod
+    def sumas(pesos, caracteristicas):
+        """w·x + b de cada modelo (filas de pesos) para cada punto: matriz (n, K)"""
+        d = caracteristicas.shape[1]
+        if d > MotorEntrenamiento.DIMENSION_EXPLICITA:
+            return caracteristicas @ pesos[:, :d].T + pesos[:, d]
+        # Mismo orden de operaciones que MotorEntrenamiento.suma_ponderada
+        suma = caracteristicas[:, 0, None] * pesos[:, 0]
+        for j in range(1, d):
+            suma += caracteristicas[:, j, None] * pesos[:, j]
+        suma += pesos[:, d]
+        return suma
+
+    def predecir(self, caracteristicas):
+        """Predicciones (1 o -1) de todos los modelos: matriz (n, K)"""
+        caracteristicas = np.asarray(caracteristicas, dtype=np.float64)
+        return np.where(self.sumas(self.pesos, caracteristicas) >= 0, 1, -1)
+
+    def precision(self, caracteristicas, etiquetas):
+        """Porcentaje de aciertos de cada modelo"""
+        if len(etiquetas) == 0:
+            return np.zeros(len(self))
+        aciertos = self.predecir(caracteristicas) == np.asarray(etiquetas)[:, None]
+        return aciertos.mean(axis=0) * 100
+
+    def epoca_secuencial(self, pesos, caracteristicas, etiquetas):
+        """Regla del perceptrón punto por punto, vectorizada sobre los modelos"""
+        d = caracteristicas.shape[1]
+        for x, etiqueta in zip(caracteristicas, etiquetas):
+            suma = self.sumas(pesos, x[None, :])[0]
+            paso = self.tasa_aprendizaje * (etiqueta - np.where(suma >= 0, 1, -1))
+            pesos[:, :d] += paso[:, None] * x
+            pesos[:, d] += paso
+        return pesos
+
+    def epoca_lotes(self, pesos, caracteristicas, etiquetas, tamano_lote=None):
+        """Regla por mini-lotes: un producto matricial por lote para todos los modelos"""
+        d = caracteristicas.shape[1]
+        n = len(caracteristicas)
+        tamano_lote = tamano_lote or max(n, 1)
+        for inicio in range(0, n, tamano_lote):
+            bloque = caracteristicas[inicio:inicio + tamano_lote]
+            prediccion = np.where(self.sumas(pesos, bloque) >= 0, 1, -1)
+            error = etiquetas[inicio:inicio + tamano_lote, None] - prediccion
+            pesos[:, :d] += self.tasa_aprendizaje * (error.T @ bloque)
+            pesos[:, d] += self.tasa_aprendizaje * error.sum(axis=0)
+        return pesos
+
+    def entrenar_epoca(self, motor, modo_entrenamiento="secuencial", tamano_lote=None):
+        """Entrenar una época los modelos activos y desactivar los que convergen.
+
+        Devuelve el número de modelos que siguen activos.
+        """
+        indices = np.flatnonzero(self.activos)
+        if indices.size == 0:
+            return 0
+        pesos = self.pesos[indices]
+        if modo_entrenamiento == "lotes":
+            pesos = self.epoca_lotes(pesos, motor.caracteristicas, motor.etiquetas, tamano_lote)
+        else:
+            pesos = self.epoca_secuencial(pesos, motor.caracteristicas, motor.etiquetas)
+        self.pesos[indices] = pesos
+        self.iteracion_actual += 1
+
+        # Igual que AgentePerceptron.verificar_convergencia: todos los puntos bien clasificados
+        prediccion = np.where(self.sumas(pesos, motor.caracteristicas) >= 0, 1, -1)
+        convergidos = indices[(prediccion == motor.etiquetas[:, None]).all(axis=0)]
+        self.activos[convergidos] = False
+        self.epocas_convergencia[convergidos] = self.iteracion_actual
+        return int(self.activos.sum())
+
+    def entrenar(self, motor, max_iteraciones=100, modo_entrenamiento="secuencial", tamano_lote=None):
+        """Entrenar hasta que todos los modelos converjan o agotar max_iteraciones"""
+        while self.iteracion_actual < max_iteraciones:
+            if self.entrenar_epoca(motor, modo_entrenamiento, tamano_lote) == 0:
+                break
+        return self.epocas_convergencia
+
+def _distribucion(valores):
+    """Resumen de una distribución de valores por modelo"""
+    if len(valores) == 0:
+        return None
+    p10, mediana, p90 = np.percentile(valores, [10, 50, 90])
+    return {
+        "media": float(np.mean(valores)),
+        "desviacion": float(np.std(valores)),
+        "minimo": float(np.min(valores)),
+        "p10": float(p10),
+        "mediana": float(mediana),
+        "p90": float(p90),
+        "maximo": float(np.max(valores)),
+    }
+
+class HistorialPesos:
+    """Búfer circular preasignado con [época, w1, ..., wd, b], una de cada `decimacion` épocas"""
+    def __init__(self, n_caracteristicas, capacidad=1000, decimacion=1):
+        self.datos = np.empty((capacidad, n_caracteristicas + 2), dtype=np.float64)
+        self.capacidad = capacidad
+        self.decimacion = decimacion
+        self.agregados = 0
+
+    def __len__(self):
+        return min(self.agregados, self.capacidad)
+
+    def agregar(self, epoca, pesos, sesgo):
+        """Guardar los pesos de la época si toca según la decimación; sobrescribe los más antiguos"""
+        if epoca % self.decimacion:
+            return
+        fila = self.datos[self.agregados % self.capacidad]
+        fila[0] = epoca
+        fila[1:-1] = pesos
+        fila[-1] = sesgo
+        self.agregados += 1
+
+    def limpiar(self):
+        self.agregados = 0
+
+    def como_arreglo(self):
+        """Filas guardadas en orden cronológico"""
+        if self.agregados <= self.capacidad:
+            return self.datos[:self.agregados].copy()
+        corte = self.agregados % self.capacidad
+        return np.concatenate((self.datos[corte:], self.datos[:corte]))
+
+    def como_diccionario(self, **metadatos):
+        """Arreglos del historial con el formato de exportar/cargar"""
+        filas = self.como_arreglo()
+        return {"epocas": filas[:, 0].astype(np.int64), "pesos": filas[:, 1:-1],
+                "sesgos": filas[:, -1], "decimacion": self.decimacion, **metadatos}
+
+    def exportar(self, ruta, **metadatos):
+        """Guardar el historial en un .npz comprimido"""
+        np.savez_compressed(ruta, **self.como_diccionario(**metadatos))
+
+    @staticmethod
+    def cargar(ruta):
+        """Leer un historial exportado como diccionario de arreglos"""
+        with np.load(ruta) as datos:
+            return {clave: datos[clave] for clave in datos.files}
 
 class AgentePerceptron(mesa.Agent):
+    # fija: orden original; barajada: orden aleatorio por época; bolsillo: conserva
+    # los mejores pesos vistos; promediado: devuelve el promedio de los pesos
+    ESTRATEGIAS = ("fija", "barajada", "bolsillo", "promediado")
+
     def __init__(self, unique_id, model):
         super().__init__(unique_id, model)
         # Inicializar pesos y sesgo aleatoriamente
-        self.peso1 = random.uniform(-1, 1)
-        self.peso2 = random.uniform(-1, 1)
-        self.sesgo = random.uniform(-1, 1)
+        self.inicializar_pesos()
         self.tasa_aprendizaje = 0.1
         self.iteracion_actual = 0
         self.max_iteraciones = 100
+        self.modo_entrenamiento = "secuencial"  # "secuencial" o "lotes"
+        self.tamano_lote = None
+        self.estrategia = "fija"
+        self.paciencia = None  # Épocas sin mejora antes de detenerse (None: sin parada temprana)
         self.entrenando = False
         self.convergio = False
-        self.historial_pesos = []
+        self.errores_epoca = None
+        self.precision_epoca = None
+        self.historial_pesos = HistorialPesos(self.model.n_caracteristicas)
+        # Caché de predicciones para los pesos actuales sobre self.model.motor; sólo
+        # el tramo [inicio, fin) de cache_pendiente está desactualizado
+        self.cache_motor = None
+        self.cache_predicciones = None
+        self.cache_pendiente = (0, 0)
+        self.reiniciar_estrategia()
         
     def step(self):
         if self.entrenando and not self.convergio and self.iteracion_actual < self.max_iteraciones:
-            self.entrenar_epoca()
+            instrumentacion = self.model.instrumentacion
+            if instrumentacion is None:
+                self.entrenar_epoca()
+            else:
+                pesos_previos, sesgo_previo = self.pesos.copy(), self.sesgo
+                inicio = time.perf_counter()
+                self.entrenar_epoca()
+                instrumentacion.fase("entrenamiento", time.perf_counter() - inicio,
+                                     self.iteracion_actual + 1)
+                instrumentacion.epoca(self.iteracion_actual + 1, self.errores_epoca, self.precision_epoca,
+                                      float(np.linalg.norm(self.pesos - pesos_previos)),
+                                      self.sesgo - sesgo_previo)
             self.iteracion_actual += 1
             
-            # Guardar historial de pesos para visualización
-            self.historial_pesos.append((self.peso1, self.peso2, self.sesgo))
+            # Guardar historial de pesos para exportarlo y reproducirlo
+            self.historial_pesos.agregar(self.iteracion_actual, self.pesos, self.sesgo)
             
             # Verificar convergencia
             if self.verificar_convergencia():
                 self.convergio = True
                 self.entrenando = False
-                print(f" Perceptrón convergió en {self.iteracion_actual} iteraciones")
+                self.model.registrar("info", f" Perceptrón convergió en {self.iteracion_actual} iteraciones")
+                return
+            
+            if self.actualizar_estrategia() or self.iteracion_actual >= self.max_iteraciones:
+                self.finalizar_entrenamiento()
+    
+    def reiniciar_estrategia(self):
+        """Descartar el estado acumulado por la estrategia de entrenamiento"""
+        self.mejores_errores = None
+        self.epocas_sin_mejora = 0
+        self.detenido_temprano = False
+        self.pesos_bolsillo = None
+        self.sesgo_bolsillo = None
+        self.suma_pesos = np.zeros(len(self.pesos) + 1)
+        self.muestras_promediadas = 0
+    
+    def actualizar_estrategia(self):
+        """Registrar el resultado de la época; devuelve True si hay que detenerse por estancamiento"""
+        errores = self.errores_epoca
+        if self.estrategia == "bolsillo" and self.model.fuente is None:
+            # El bolsillo compara errores reales de los pesos actuales (leídos de la caché)
+            errores = int(np.count_nonzero(self.predicciones_actuales() != self.model.motor.etiquetas))
+        
+        if self.mejores_errores is None or errores < self.mejores_errores:
+            self.mejores_errores = errores
+            self.epocas_sin_mejora = 0
+            if self.estrategia == "bolsillo":
+                self.pesos_bolsillo = self.pesos.copy()
+                self.sesgo_bolsillo = self.sesgo
+        else:
+            self.epocas_sin_mejora += 1
+        
+        self.detenido_temprano = self.paciencia is not None and self.epocas_sin_mejora >= self.paciencia
+        return self.detenido_temprano
+    
+    def finalizar_entrenamiento(self):
+        """Detener el entrenamiento y, sin convergencia, aplicar los pesos del bolsillo o el promedio"""
+        estaba_entrenando = self.entrenando
+        self.entrenando = False
+        if self.convergio:
+            return
+        if self.estrategia == "bolsillo" and self.pesos_bolsillo is not None:
+            self.pesos = self.pesos_bolsillo.copy()
+            self.sesgo = self.sesgo_bolsillo
+        elif self.estrategia == "promediado" and self.muestras_promediadas:
+            promedio = self.suma_pesos / self.muestras_promediadas
+            self.pesos = promedio[:-1]
+            self.sesgo = float(promedio[-1])
+        else:
+            return
+        self.invalidar_cache()
+        if self.detenido_temprano and estaba_entrenando:
+            self.model.registrar(
+                "info", f" Entrenamiento detenido por estancamiento en {self.iteracion_actual} iteraciones")
+    
+    def inicializar_pesos(self):
+        """Vector de pesos y sesgo aleatorios en [-1, 1]"""
+        self.pesos = np.array([self.random.uniform(-1, 1) for _ in range(self.model.n_caracteristicas)])
+        self.sesgo = self.random.uniform(-1, 1)
+        self.invalidar_cache()
+    
+    def configurar_historial(self, capacidad=1000, decimacion=1):
+        """Reemplazar el historial por uno nuevo de la capacidad y decimación dadas"""
+        self.historial_pesos = HistorialPesos(len(self.pesos), capacidad, decimacion)
+    
+    def invalidar_cache(self):
+        """Descartar las predicciones guardadas (los pesos o los datos cambiaron)"""
+        self.cache_motor = None
+    
+    # Pesos de las dos primeras características: proyección usada por la visualización
+    @property
+    def peso1(self):
+        return float(self.pesos[0])
     
-    def predecir(self, x1, x2):
-        """Realizar predicción para un punto (x1, x2)"""
-        suma_ponderada = self.peso1 * x1 + self.peso2 * x2 + self.sesgo
+    @peso1.setter
+    def peso1(self, valor):
+        self.pesos[0] = valor
+        self.invalidar_cache()
+    
+    @property
+    def peso2(self):
+        return float(self.pesos[1]) if len(self.pesos) > 1 else 0.0
+    
+    @peso2.setter
+    def peso2(self, valor):
+        self.pesos[1] = valor
+        self.invalidar_cache()
+    
+    def predecir(self, *x):
+        """Realizar predicción para un punto (x1, x2, ..., xd)"""
+        suma_ponderada = self.pesos[0] * x[0]
+        for peso, xi in zip(self.pesos[1:], x[1:]):
+            suma_ponderada += peso * xi
+        suma_ponderada += self.sesgo
         return 1 if suma_ponderada >= 0 else -1
     
+    def predecir_conjunto(self, motor):
+        """Predicciones vectorizadas para todos los puntos del motor"""
+        if motor is self.model.motor:
+            return self.predicciones_actuales()
+        return motor.predecir(self.pesos, self.sesgo)
+    
+    def preparar_cache(self):
+        """Asociar la caché a los datos actuales del modelo, marcándola entera como pendiente"""
+        motor = self.model.motor
+        if self.cache_motor is not motor:
+            self.cache_motor = motor
+            self.cache_predicciones = np.empty(len(motor), dtype=np.int64)
+            self.cache_pendiente = (0, len(motor))
+        return self.cache_predicciones
+    
+    def predicciones_actuales(self):
+        """Predicciones de los pesos actuales sobre los datos del modelo, desde la caché.
+
+        Sólo se evalúan los puntos cuya predicción quedó desactualizada: todos
+        si la caché no es válida, o el tramo anterior a la última
+        actualización de pesos de la época.
+        """
+        self.preparar_cache()
+        inicio, fin = self.cache_pendiente
+        if inicio < fin:
+            self.cache_predicciones[inicio:fin] = self.model.motor.predecir(
+                self.pesos, self.sesgo, inicio, fin)
+            self.cache_pendiente = (0, 0)
+        return self.cache_predicciones
+    
     def entrenar_epoca(self):
         """Entrenar por una época completa"""
+        fuente = self.model.fuente
+        motores = fuente.fragmentos() if fuente is not None else [self.model.motor]
+        barajada = self.estrategia == "barajada" and fuente is None
+        if barajada:
+            motores = [self.model.motor.reordenado(self.model.generador.permutation(len(self.model.motor)))]
+        acumulado = self.suma_pesos if self.estrategia == "promediado" else None
+        pesos = self.pesos
+        sesgo = self.sesgo
         puntos_mal_clasificados = 0
-        
-        for punto in self.model.agentes_puntos:
-            prediccion = self.predecir(punto.x, punto.y)
-            error = punto.etiqueta_real - prediccion
-            
-            if error != 0:
-                puntos_mal_clasificados += 1
-                # Actualizar pesos y sesgo usando la regla del perceptrón
-                self.peso1 += self.tasa_aprendizaje * error * punto.x
-                self.peso2 += self.tasa_aprendizaje * error * punto.y
-                self.sesgo += self.tasa_aprendizaje * error
-        
-        print(f"Iteración {self.iteracion_actual}: {puntos_mal_clasificados} errores")
+        n_puntos = 0
+
+        # En memoria hay un único motor, cuyas predicciones se guardan en la
+        # caché durante la misma pasada; desde disco, un motor por fragmento
+        predicciones = self.preparar_cache() if fuente is None and not barajada else None
+
+        for motor in motores:
+            if self.modo_entrenamiento == "lotes":
+                pesos, sesgo, errores = motor.epoca_lotes(
+                    pesos, sesgo, self.tasa_aprendizaje, self.tamano_lote, predicciones, acumulado)
+            else:
+                pesos, sesgo, errores = motor.epoca_secuencial(
+                    pesos, sesgo, self.tasa_aprendizaje, predicciones, acumulado)
+            puntos_mal_clasificados += errores
+            n_puntos += len(motor)
+
+        self.pesos = pesos
+        self.sesgo = float(sesgo)
+        self.muestras_promediadas += n_puntos if acumulado is not None else 0
+        if barajada:
+            # El motor reordenado es una copia: sus evaluaciones se suman al del modelo
+            self.model.motor.evaluaciones += motores[0].evaluaciones
+            self.invalidar_cache()
+        elif fuente is None:
+            # Sólo quedan desactualizadas las predicciones hasta la última actualización
+            self.cache_pendiente = (0, self.model.motor.ultima_actualizacion + 1)
+        self.errores_epoca = puntos_mal_clasificados
+        self.precision_epoca = (n_puntos - puntos_mal_clasificados) / n_puntos * 100 if n_puntos else 0.0
+
+        self.model.registrar("depuracion", f"Iteración {self.iteracion_actual}: {puntos_mal_clasificados} errores")
     
     def verificar_convergencia(self):
         """Verificar si todos los puntos están clasificados correctamente"""
-        for punto in self.model.agentes_puntos:
-            if self.predecir(punto.x, punto.y) != punto.etiqueta_real:
+        if self.model.fuente is not None:
+            # Una época sin errores no modificó los pesos: todos los puntos quedaron bien
+            # clasificados, así que no hace falta una segunda pasada por el disco
+            return self.errores_epoca == 0
+        
+        # Se completa la caché por bloques crecientes y se corta en el primer error,
+        # así que sin convergencia el chequeo suele costar una fracción de pasada
+        motor = self.model.motor
+        predicciones = self.preparar_cache()
+        inicio, fin = self.cache_pendiente
+        tamano = motor.BLOQUE_MINIMO
+        while inicio < fin:
+            fin_bloque = min(inicio + tamano, fin)
+            predicciones[inicio:fin_bloque] = motor.predecir(self.pesos, self.sesgo, inicio, fin_bloque)
+            self.cache_pendiente = (fin_bloque, fin)
+            if not np.array_equal(predicciones[inicio:fin_bloque], motor.etiquetas[inicio:fin_bloque]):
                 return False
-        return True
+            inicio = fin_bloque
+            tamano = min(tamano * 2, motor.BLOQUE_MAXIMO)
+        return np.array_equal(predicciones, motor.etiquetas)
     
     def obtener_linea_decision(self):
         """Obtener puntos para dibujar la línea de decisión"""
@@ -72,80 +626,189 @@ class AgentePerceptron(mesa.Agent):
     
     def calcular_precision(self, puntos):
         """Calcular precisión en un conjunto de puntos"""
-        correctos = 0
-        for punto in puntos:
-            if self.predecir(punto.x, punto.y) == punto.etiqueta_real:
-                correctos += 1
-        return correctos / len(puntos) * 100
-
-class AgentePunto(mesa.Agent):
-    def __init__(self, unique_id, model, x, y, etiqueta_real):
-        super().__init__(unique_id, model)
-        self.x = x
-        self.y = y
-        self.etiqueta_real = etiqueta_real
-        self.etiqueta_predicha = 0
-        self.color = 'gray'  # Color inicial
-    
-    def actualizar_prediccion(self):
-        """Actualizar predicción y color basado en el perceptrón actual"""
-        perceptron = self.model.perceptron
-        self.etiqueta_predicha = perceptron.predecir(self.x, self.y)
-        
-        # Actualizar color: verde si correcto, rojo si incorrecto
-        if self.etiqueta_predicha == self.etiqueta_real:
-            self.color = 'green'
+        if puntos is self.model.motor and len(puntos) > 0:
+            correctos = np.count_nonzero(self.predicciones_actuales() == puntos.etiquetas)
+            return correctos / len(puntos) * 100
+        if not isinstance(puntos, (MotorEntrenamiento, FuenteDisco)):
+            puntos = MotorEntrenamiento.desde_puntos(puntos)
+        return puntos.precision(self.pesos, self.sesgo)
+
+# Vista liviana de un punto, sólo para consumo de la visualización
+VistaPunto = namedtuple("VistaPunto", ["x", "y", "etiqueta_real", "etiqueta_predicha", "color"])
+
+class ConjuntoPuntos:
+    """Conjunto de puntos en formato columnar: características, etiqueta real y predicha.
+
+    Con más de dos características, x e y son la proyección sobre las dos primeras.
+    """
+    def __init__(self, caracteristicas, etiquetas_reales):
+        caracteristicas = np.ascontiguousarray(caracteristicas, dtype=np.float64)
+        if caracteristicas.ndim == 1:
+            caracteristicas = caracteristicas.reshape(-1, 1)
+        self.caracteristicas = caracteristicas
+        self.etiquetas_reales = np.ascontiguousarray(etiquetas_reales, dtype=np.int64)
+        self.etiquetas_predichas = np.zeros(len(self.etiquetas_reales), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.etiquetas_reales)
+
+    def __getitem__(self, i):
+        x, y = self.caracteristicas[i, :2]
+        real = int(self.etiquetas_reales[i])
+        predicha = int(self.etiquetas_predichas[i])
+        color = 'gray' if predicha == 0 else ('green' if predicha == real else 'red')
+        return VistaPunto(float(x), float(y), real, predicha, color)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def x(self):
+        return self.caracteristicas[:, 0]
+
+    @property
+    def y(self):
+        return self.caracteristicas[:, 1]
+
+    def actualizar_predicciones(self, predicciones):
+        """Guardar las predicciones del perceptrón actual"""
+        self.etiquetas_predichas[:] = predicciones
+
+    COLORES = np.array(['gray', 'green', 'red'])
+
+    def indices_color(self):
+        """Índice en COLORES por punto: 0 sin predicción, 1 si es correcto, 2 si no"""
+        indices = np.where(self.etiquetas_predichas == self.etiquetas_reales, 1, 2)
+        indices[self.etiquetas_predichas == 0] = 0
+        return indices
+
+    def colores(self):
+        """Colores por punto: gris sin predicción, verde si es correcto, rojo si no"""
+        return self.COLORES[self.indices_color()]
+
+    def precision(self):
+        """Porcentaje de aciertos según las últimas predicciones guardadas"""
+        if len(self) == 0:
+            return 0.0
+        return float(np.count_nonzero(self.etiquetas_predichas == self.etiquetas_reales)) / len(self) * 100
+
+class FuenteDisco:
+    """Conjunto de entrenamiento en disco, recorrido por fragmentos con memoria acotada.
+
+    Cada registro es una fila float64 [x1, ..., xd, etiqueta], guardada en un
+    .npy (que se mapea en memoria) o en un binario crudo de n_columnas columnas.
+    Con barajar=True cada época visita los fragmentos en orden aleatorio y
+    mezcla las filas dentro de cada fragmento (barajado por bloques), con el
+    generador dado o, si no hay, con el global de numpy.
+    """
+    def __init__(self, ruta, tamano_fragmento=65536, barajar=False, n_columnas=3, generador=None):
+        if str(ruta).endswith(".npy"):
+            self.datos = np.load(ruta, mmap_mode="r")
         else:
-            self.color = 'red'
+            self.datos = np.memmap(ruta, dtype=np.float64, mode="r").reshape(-1, n_columnas)
+        self.tamano_fragmento = tamano_fragmento
+        self.barajar = barajar
+        self.generador = generador if generador is not None else np.random
+
+    def __len__(self):
+        return self.datos.shape[0]
+
+    def fragmentos(self):
+        """Generar un MotorEntrenamiento por fragmento; sólo uno reside en memoria a la vez"""
+        inicios = np.arange(0, len(self), self.tamano_fragmento)
+        if self.barajar:
+            inicios = self.generador.permutation(inicios)
+
+        for inicio in inicios:
+            fragmento = np.array(self.datos[inicio:inicio + self.tamano_fragmento], dtype=np.float64)
+            if self.barajar:
+                fragmento = fragmento[self.generador.permutation(len(fragmento))]
+            yield MotorEntrenamiento(fragmento[:, :-1], fragmento[:, -1].astype(np.int64))
+
+    def precision(self, pesos, sesgo):
+        """Porcentaje de puntos bien clasificados, acumulado fragmento a fragmento"""
+        if len(self) == 0:
+            return 0.0
+        errores = sum(motor.contar_errores(pesos, sesgo) for motor in self.fragmentos())
+        return (len(self) - errores) / len(self) * 100
 
 class AgenteDatos(mesa.Agent):
     def __init__(self, unique_id, model):
         super().__init__(unique_id, model)
         self.pendiente_real = 0.5  # Pendiente de la línea de separación real
         self.intercepto_real = 0.2  # Intercepto de la línea real
+        # Coeficientes del hiperplano real para las características a partir de la tercera;
+        # con ellas en cero, la frontera se proyecta sobre la línea real
+        self.coeficientes_extra = model.generador.uniform(-1, 1, size=max(model.n_caracteristicas - 2, 0))
     
-    def generar_datos_entrenamiento(self, n_puntos=20):
-        """Generar datos de entrenamiento linealmente separables"""
-        agentes_puntos = []
+    def generar_conjunto(self, n_puntos):
+        """Generar puntos linealmente separables en una sola llamada vectorizada"""
+        coordenadas = self.model.generador.uniform(-1, 1, size=(n_puntos, self.model.n_caracteristicas))
         
-        for i in range(n_puntos):
-            x = random.uniform(-1, 1)
-            y = random.uniform(-1, 1)
-            
-            # Determinar etiqueta real según la línea de separación
-            if y > self.pendiente_real * x + self.intercepto_real:
-                etiqueta_real = 1
-            else:
-                etiqueta_real = -1
-            
-            punto = AgentePunto(i, self.model, x, y, etiqueta_real)
-            agentes_puntos.append(punto)
+        # Determinar etiqueta real según la línea (o el hiperplano) de separación
+        frontera = self.pendiente_real * coordenadas[:, 0] + self.intercepto_real
+        if len(self.coeficientes_extra):
+            frontera += coordenadas[:, 2:] @ self.coeficientes_extra
+        sobre_linea = coordenadas[:, 1] > frontera
+        etiquetas_reales = np.where(sobre_linea, 1, -1)
         
-        return agentes_puntos
+        # Con ruido, una fracción de etiquetas se invierte y los datos dejan de ser separables
+        if self.model.ruido:
+            etiquetas_reales[self.model.generador.random(n_puntos) < self.model.ruido] *= -1
+        
+        return ConjuntoPuntos(coordenadas, etiquetas_reales)
+    
+    def generar_archivo(self, ruta, n_puntos, tamano_fragmento=1_000_000):
+        """Escribir un .npy de n_puntos filas [x1, ..., xd, etiqueta] generando por fragmentos"""
+        n_columnas = self.model.n_caracteristicas + 1
+        archivo = np.lib.format.open_memmap(ruta, mode="w+", dtype=np.float64, shape=(n_puntos, n_columnas))
+        for inicio in range(0, n_puntos, tamano_fragmento):
+            fin = min(inicio + tamano_fragmento, n_puntos)
+            conjunto = self.generar_conjunto(fin - inicio)
+            archivo[inicio:fin, :-1] = conjunto.caracteristicas
+            archivo[inicio:fin, -1] = conjunto.etiquetas_reales
+        archivo.flush()
+        del archivo
+    
+    def generar_datos_entrenamiento(self, n_puntos=20):
+        """Generar datos de entrenamiento linealmente separables"""
+        return self.generar_conjunto(n_puntos)
     
     def generar_datos_prueba(self, n_puntos=10):
         """Generar datos de prueba"""
-        agentes_prueba = []
-        
-        for i in range(n_puntos):
-            x = random.uniform(-1, 1)
-            y = random.uniform(-1, 1)
-            
-            if y > self.pendiente_real * x + self.intercepto_real:
-                etiqueta_real = 1
-            else:
-                etiqueta_real = -1
-            
-            punto = AgentePunto(100 + i, self.model, x, y, etiqueta_real)
-            agentes_prueba.append(punto)
-        
-        return agentes_prueba
+        return self.generar_conjunto(n_puntos)
 
 class ModeloPerceptron(mesa.Model):
-    def __init__(self, n_puntos=20):
+    def __init__(self, n_puntos=20, verboso=True, fuente=None, fuente_prueba=None, n_caracteristicas=2,
+                 ruido=0.0, instrumentacion=None, semilla=None):
         super().__init__()
+        # Generadores propios del modelo: self.random (mesa) para los pesos iniciales y
+        # self.generador (numpy) para los datos y el barajado. Sin semilla se usan los
+        # estados globales, como antes
+        self.semilla = semilla
+        if semilla is not None:
+            self.reset_randomizer(semilla)
+            self.generador = np.random.default_rng(semilla)
+        else:
+            self.generador = np.random
         self.schedule = mesa.time.RandomActivation(self)
-        self.n_puntos = n_puntos
+        self.n_puntos = n_puntos if fuente is None else len(fuente)
+        self.n_caracteristicas = n_caracteristicas if fuente is None else fuente.datos.shape[1] - 1
+        if self.n_caracteristicas < 2:
+            # Los puntos, la recta real y la visualización usan las dos primeras coordenadas
+            raise ValueError(f"Se necesitan al menos 2 características (hay {self.n_caracteristicas})")
+        self.verboso = verboso
+        # Sin instrumentación (None) el paso no mide nada; verboso equivale a un
+        # sumidero de consola con todo el progreso por época. La del llamador no
+        # se modifica: el modelo usa una propia con sus sumideros y la consola
+        if verboso:
+            sumideros = instrumentacion.sumideros if instrumentacion is not None else ()
+            instrumentacion = Instrumentacion(*sumideros, SumideroConsola("depuracion"))
+        self.instrumentacion = instrumentacion
+        self.ruido = ruido
+        self.fuente = fuente
+        self.fuente_prueba = fuente_prueba
         
         # Crear agentes
         self.perceptron = AgentePerceptron(0, self)
@@ -154,10 +817,13 @@ class ModeloPerceptron(mesa.Model):
         self.agente_datos = AgenteDatos(1, self)
         self.schedule.add(self.agente_datos)
         
-        # Generar datos de entrenamiento
-        self.agentes_puntos = self.agente_datos.generar_datos_entrenamiento(n_puntos)
-        for punto in self.agentes_puntos:
-            self.schedule.add(punto)
+        # Generar datos de entrenamiento (fuera del planificador); con una
+        # fuente en disco los datos se leen por fragmentos en cada época
+        self.puntos = None
+        self.motor = None
+        if fuente is None:
+            self.puntos = self.agente_datos.generar_datos_entrenamiento(n_puntos)
+            self.motor = MotorEntrenamiento.desde_puntos(self.puntos)
         
         # Configurar visualización
         self.fig, self.ax = None, None
@@ -165,17 +831,102 @@ class ModeloPerceptron(mesa.Model):
         self.linea_decision = None
         self.linea_real = None
         self.texto_info = None
+        self.fondo = None
+        self.temporizador = None
+        self.paleta = None
+        self.epocas_por_cuadro = 1
+        self.intervalo_ms = 50
         
     def step(self):
-        self.schedule.step()
+        self.cronometrar_fase("planificador", self.schedule.step)
+        if self.puntos is None:
+            return
         # Actualizar predicciones de todos los puntos
-        for punto in self.agentes_puntos:
-            punto.actualizar_prediccion()
+        self.cronometrar_fase("predicciones", self.refrescar_predicciones)
+    
+    def refrescar_predicciones(self):
+        self.puntos.actualizar_predicciones(self.perceptron.predecir_conjunto(self.motor))
+    
+    def cronometrar_fase(self, fase, funcion):
+        """Ejecutar una fase del paso y, si hay instrumentación, registrar su duración"""
+        if self.instrumentacion is None:
+            return funcion()
+        inicio = time.perf_counter()
+        resultado = funcion()
+        self.instrumentacion.fase(fase, time.perf_counter() - inicio, self.perceptron.iteracion_actual)
+        return resultado
+    
+    def registrar(self, nivel, texto):
+        """Mensaje de progreso para los sumideros (sustituye a los print de verboso)"""
+        if self.instrumentacion is not None:
+            self.instrumentacion.mensaje(nivel, texto)
+    
+    def ejecutar_entrenamiento(self, n_prueba=10):
+        """Entrenar sin interfaz gráfica hasta converger o agotar max_iteraciones"""
+        perceptron = self.perceptron
+        perceptron.entrenando = True
+        perceptron.convergio = False
+        
+        iteracion_inicial = perceptron.iteracion_actual
+        evaluaciones_iniciales = self.motor.evaluaciones if self.motor is not None else 0
+        inicio = time.perf_counter()
+        while (perceptron.entrenando and
+               not perceptron.convergio and
+               perceptron.iteracion_actual < perceptron.max_iteraciones):
+            # Sin visualización no hace falta refrescar las predicciones en cada paso
+            self.cronometrar_fase("planificador", self.schedule.step)
+        tiempo = time.perf_counter() - inicio
+        
+        perceptron.finalizar_entrenamiento()
+        if self.puntos is not None:
+            self.puntos.actualizar_predicciones(perceptron.predecir_conjunto(self.motor))
+        
+        metricas = self.obtener_metricas(n_prueba)
+        metricas["tiempo_segundos"] = tiempo
+        epocas = perceptron.iteracion_actual - iteracion_inicial
+        if self.motor is not None and epocas and len(self.motor):
+            # Evaluaciones por punto y época (entrenamiento, convergencia y refresco final)
+            evaluaciones = self.motor.evaluaciones - evaluaciones_iniciales
+            metricas["evaluaciones_por_epoca"] = evaluaciones / (len(self.motor) * epocas)
+        return metricas
+    
+    def obtener_metricas(self, n_prueba=10):
+        """Métricas del perceptrón actual sobre entrenamiento y datos de prueba nuevos"""
+        if self.fuente is not None:
+            # Desde disco se usa la precisión acumulada durante la última época
+            precision_entrenamiento = self.perceptron.precision_epoca
+            precision_prueba = (self.perceptron.calcular_precision(self.fuente_prueba)
+                                if self.fuente_prueba is not None else None)
+        else:
+            precision_entrenamiento = self.perceptron.calcular_precision(self.motor)
+            precision_prueba = self.perceptron.calcular_precision(
+                self.agente_datos.generar_datos_prueba(n_prueba))
+        return {
+            "n_puntos": self.n_puntos,
+            "tasa_aprendizaje": self.perceptron.tasa_aprendizaje,
+            "max_iteraciones": self.perceptron.max_iteraciones,
+            "iteraciones": self.perceptron.iteracion_actual,
+            "convergio": self.perceptron.convergio,
+            "estrategia": self.perceptron.estrategia,
+            "detenido_temprano": self.perceptron.detenido_temprano,
+            "precision_entrenamiento": precision_entrenamiento,
+            "precision_prueba": precision_prueba,
+            "peso1": self.perceptron.peso1,
+            "peso2": self.perceptron.peso2,
+            "pesos": self.perceptron.pesos.tolist(),
+            "sesgo": self.perceptron.sesgo,
+        }
     
     def configurar_visualizacion(self):
         """Configurar la interfaz gráfica"""
+        plt = _pyplot()
+        from matplotlib.widgets import Slider, Button
+        
+        from matplotlib.colors import to_rgba_array
+        
         self.fig, self.ax = plt.subplots(figsize=(10, 8))
-        plt.subplots_adjust(bottom=0.3)
+        plt.subplots_adjust(bottom=0.32)
+        self.paleta = to_rgba_array(ConjuntoPuntos.COLORES, alpha=0.7)
         
         # Configurar ejes
         self.ax.set_xlim(-1.2, 1.2)
@@ -188,8 +939,9 @@ class ModeloPerceptron(mesa.Model):
         self.ax.axvline(x=0, color='k', alpha=0.3)
         
         # Crear sliders
-        ax_tasa_aprendizaje = plt.axes([0.2, 0.2, 0.6, 0.03])
-        ax_iteraciones = plt.axes([0.2, 0.15, 0.6, 0.03])
+        ax_tasa_aprendizaje = plt.axes([0.2, 0.22, 0.6, 0.03])
+        ax_iteraciones = plt.axes([0.2, 0.17, 0.6, 0.03])
+        ax_epocas_cuadro = plt.axes([0.2, 0.12, 0.6, 0.03])
         
         self.slider_tasa = Slider(
             ax_tasa_aprendizaje, 'Tasa de Aprendizaje', 0.01, 1.0, 
@@ -199,10 +951,14 @@ class ModeloPerceptron(mesa.Model):
             ax_iteraciones, 'Iteraciones Máximas', 10, 500, 
             valinit=100, valstep=10
         )
+        self.slider_epocas_cuadro = Slider(
+            ax_epocas_cuadro, 'Épocas por Cuadro', 1, 50,
+            valinit=self.epocas_por_cuadro, valstep=1
+        )
         
         # Crear botones
-        ax_iniciar = plt.axes([0.3, 0.05, 0.15, 0.06])
-        ax_reiniciar = plt.axes([0.55, 0.05, 0.15, 0.06])
+        ax_iniciar = plt.axes([0.3, 0.02, 0.15, 0.06])
+        ax_reiniciar = plt.axes([0.55, 0.02, 0.15, 0.06])
         
         self.boton_iniciar = Button(ax_iniciar, 'Iniciar Entrenamiento')
         self.boton_reiniciar = Button(ax_reiniciar, 'Reiniciar')
@@ -210,13 +966,22 @@ class ModeloPerceptron(mesa.Model):
         # Conectar eventos
         self.slider_tasa.on_changed(self.actualizar_tasa_aprendizaje)
         self.slider_iteraciones.on_changed(self.actualizar_max_iteraciones)
+        self.slider_epocas_cuadro.on_changed(self.actualizar_epocas_por_cuadro)
         self.boton_iniciar.on_clicked(self.iniciar_entrenamiento)
         self.boton_reiniciar.on_clicked(self.reiniciar_simulacion)
         
+        # Cada redibujado completo renueva el fondo usado para el blitting
+        self.fig.canvas.mpl_connect('draw_event', self.capturar_fondo)
+        
+        # Temporizador del bucle de animación (sin recursión ni plt.pause)
+        self.temporizador = self.fig.canvas.new_timer(interval=self.intervalo_ms)
+        self.temporizador.add_callback(self.ejecutar_cuadro)
+        
         self.dibujar_estado_inicial()
     
     def dibujar_estado_inicial(self):
         """Dibujar estado inicial"""
+        plt = _pyplot()
         self.ax.clear()
         self.ax.set_xlim(-1.2, 1.2)
         self.ax.set_ylim(-1.2, 1.2)
@@ -226,11 +991,8 @@ class ModeloPerceptron(mesa.Model):
         self.ax.grid(True, alpha=0.3)
         
         # Dibujar puntos
-        x_vals = [p.x for p in self.agentes_puntos]
-        y_vals = [p.y for p in self.agentes_puntos]
-        colores = [p.color for p in self.agentes_puntos]
-        
-        self.scatter = self.ax.scatter(x_vals, y_vals, c=colores, s=50, alpha=0.7)
+        self.scatter = self.ax.scatter(self.puntos.x, self.puntos.y, c=self.puntos.colores(),
+                                       s=50, alpha=0.7)
         
         # Dibujar línea de separación real
         x_real = np.array([-1, 1])
@@ -240,39 +1002,61 @@ class ModeloPerceptron(mesa.Model):
         
         # Dibujar línea de decisión actual
         x_decision, y_decision = self.perceptron.obtener_linea_decision()
-        if len(x_decision) > 0:
-            self.linea_decision, = self.ax.plot(x_decision, y_decision, 'r-', 
-                                             linewidth=2, label='Línea de Decisión')
+        self.linea_decision, = self.ax.plot(x_decision, y_decision, 'r-', 
+                                         linewidth=2, label='Línea de Decisión')
         
         # Información del estado
-        precision = self.perceptron.calcular_precision(self.agentes_puntos)
+        precision = self.perceptron.calcular_precision(self.motor)
         info_str = f"Iteración: {self.perceptron.iteracion_actual}\nPrecisión: {precision:.1f}%"
         self.texto_info = self.ax.text(0.02, 0.98, info_str, transform=self.ax.transAxes,
                                      verticalalignment='top', 
                                      bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
         
         self.ax.legend()
+        
+        # Los artistas animados se excluyen del fondo y se redibujan por blitting
+        for artista in self.artistas_animados():
+            artista.set_animated(True)
+        self.fondo = None
         plt.draw()
     
+    def artistas_animados(self):
+        return (self.scatter, self.linea_decision, self.texto_info)
+    
+    def capturar_fondo(self, event=None):
+        """Guardar el fondo sin artistas animados y dibujar éstos encima"""
+        canvas = self.fig.canvas
+        if not getattr(canvas, 'supports_blit', False):
+            return
+        self.fondo = canvas.copy_from_bbox(self.ax.bbox)
+        for artista in self.artistas_animados():
+            self.ax.draw_artist(artista)
+    
     def actualizar_visualizacion(self):
-        """Actualizar visualización"""
+        """Actualizar visualización redibujando sólo colores, línea de decisión y texto"""
         # Actualizar colores de puntos
-        colores = [p.color for p in self.agentes_puntos]
-        self.scatter.set_color(colores)
+        self.scatter.set_facecolor(self.paleta[self.puntos.indices_color()])
         
         # Actualizar línea de decisión
         x_decision, y_decision = self.perceptron.obtener_linea_decision()
-        if len(x_decision) > 0:
-            self.linea_decision.set_data(x_decision, y_decision)
+        self.linea_decision.set_data(x_decision, y_decision)
         
-        # Actualizar información
-        precision = self.perceptron.calcular_precision(self.agentes_puntos)
+        # Actualizar información con las predicciones ya calculadas
+        precision = self.puntos.precision()
         info_str = f"Iteración: {self.perceptron.iteracion_actual}\nPrecisión: {precision:.1f}%"
         if self.perceptron.convergio:
             info_str += "\n CONVERGIDO!"
         self.texto_info.set_text(info_str)
         
-        plt.draw()
+        canvas = self.fig.canvas
+        if self.fondo is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self.fondo)
+        for artista in self.artistas_animados():
+            self.ax.draw_artist(artista)
+        canvas.blit(self.ax.bbox)
+        canvas.flush_events()
     
     def actualizar_tasa_aprendizaje(self, valor):
         self.perceptron.tasa_aprendizaje = valor
@@ -280,66 +1064,351 @@ class ModeloPerceptron(mesa.Model):
     def actualizar_max_iteraciones(self, valor):
         self.perceptron.max_iteraciones = int(valor)
     
+    def actualizar_epocas_por_cuadro(self, valor):
+        self.epocas_por_cuadro = int(valor)
+    
+    def entrenamiento_activo(self):
+        perceptron = self.perceptron
+        return (perceptron.entrenando and
+                not perceptron.convergio and
+                perceptron.iteracion_actual < perceptron.max_iteraciones)
+    
     def iniciar_entrenamiento(self, event):
         if not self.perceptron.entrenando:
             self.perceptron.entrenando = True
             self.perceptron.convergio = False
             print("Iniciando entrenamiento del perceptrón...")
-            
-            # Función para ejecutar pasos de entrenamiento
-            def ejecutar_paso():
-                if (self.perceptron.entrenando and 
-                    not self.perceptron.convergio and 
-                    self.perceptron.iteracion_actual < self.perceptron.max_iteraciones):
-                    
-                    self.step()
-                    self.actualizar_visualizacion()
-                    plt.pause(0.1)  # Pausa para visualización
-                    ejecutar_paso()
-                else:
-                    # Evaluar con datos de prueba al finalizar
-                    self.evaluar_perceptron()
-            
-            ejecutar_paso()
+            self.temporizador.start()
+    
+    def ejecutar_cuadro(self):
+        """Avanzar epocas_por_cuadro épocas y redibujar una sola vez (callback del temporizador)"""
+        for _ in range(self.epocas_por_cuadro):
+            if not self.entrenamiento_activo():
+                break
+            self.cronometrar_fase("planificador", self.schedule.step)
+        
+        terminado = not self.entrenamiento_activo()
+        if terminado:
+            self.perceptron.finalizar_entrenamiento()
+        
+        # Las predicciones de los puntos se refrescan una vez por cuadro, no por época
+        self.cronometrar_fase("predicciones", self.refrescar_predicciones)
+        self.cronometrar_fase("dibujo", self.actualizar_visualizacion)
+        
+        if terminado:
+            self.temporizador.stop()
+            # Evaluar con datos de prueba al finalizar
+            self.evaluar_perceptron()
     
     def reiniciar_simulacion(self, event):
         """Reiniciar simulación"""
+        if self.temporizador is not None:
+            self.temporizador.stop()
+        
         # Reiniciar perceptrón
-        self.perceptron.peso1 = random.uniform(-1, 1)
-        self.perceptron.peso2 = random.uniform(-1, 1)
-        self.perceptron.sesgo = random.uniform(-1, 1)
+        self.perceptron.inicializar_pesos()
         self.perceptron.iteracion_actual = 0
         self.perceptron.entrenando = False
         self.perceptron.convergio = False
-        self.perceptron.historial_pesos = []
+        self.perceptron.historial_pesos.limpiar()
+        self.perceptron.reiniciar_estrategia()
         
         # Regenerar datos
-        self.agentes_puntos = self.agente_datos.generar_datos_entrenamiento(self.n_puntos)
+        self.puntos = self.agente_datos.generar_datos_entrenamiento(self.n_puntos)
+        self.motor = MotorEntrenamiento.desde_puntos(self.puntos)
         
         # Actualizar predicciones iniciales
-        for punto in self.agentes_puntos:
-            punto.actualizar_prediccion()
+        self.puntos.actualizar_predicciones(self.perceptron.predecir_conjunto(self.motor))
         
         # Redibujar
         self.dibujar_estado_inicial()
         print("Simulación reiniciada")
     
+    def datos_historial(self):
+        """Trayectoria de pesos junto con la línea real, para exportarla o guardarla en caché"""
+        return self.perceptron.historial_pesos.como_diccionario(
+            pendiente_real=self.agente_datos.pendiente_real,
+            intercepto_real=self.agente_datos.intercepto_real)
+    
+    def exportar_historial(self, ruta):
+        """Exportar la trayectoria de pesos para reproducirla luego"""
+        np.savez_compressed(ruta, **self.datos_historial())
+    
     def evaluar_perceptron(self):
         """Evaluar el perceptrón con datos de prueba"""
-        datos_prueba = self.agente_datos.generar_datos_prueba(10)
-        precision_prueba = self.perceptron.calcular_precision(datos_prueba)
+        metricas = self.obtener_metricas(10)
         
         print(f"\n EVALUACIÓN FINAL:")
-        print(f"Precisión en entrenamiento: {self.perceptron.calcular_precision(self.agentes_puntos):.1f}%")
-        print(f"Precisión en prueba: {precision_prueba:.1f}%")
-        print(f"Pesos finales: w1={self.perceptron.peso1:.3f}, w2={self.perceptron.peso2:.3f}")
-        print(f"Sesgo final: {self.perceptron.sesgo:.3f}")
+        print(f"Precisión en entrenamiento: {metricas['precision_entrenamiento']:.1f}%")
+        print(f"Precisión en prueba: {metricas['precision_prueba']:.1f}%")
+        print(f"Pesos finales: w1={metricas['peso1']:.3f}, w2={metricas['peso2']:.3f}")
+        print(f"Sesgo final: {metricas['sesgo']:.3f}")
+
+# Entrenamiento por lotes, sin interfaz gráfica
+def _configurar_perceptron(modelo, tasa_aprendizaje, max_iteraciones, modo_entrenamiento,
+                           tamano_lote, capacidad_historial, decimacion_historial,
+                           estrategia, paciencia):
+    if estrategia not in AgentePerceptron.ESTRATEGIAS:
+        raise ValueError(f"Estrategia desconocida: {estrategia}")
+    perceptron = modelo.perceptron
+    perceptron.estrategia = estrategia
+    perceptron.paciencia = paciencia
+    perceptron.tasa_aprendizaje = tasa_aprendizaje
+    perceptron.max_iteraciones = max_iteraciones
+    perceptron.modo_entrenamiento = modo_entrenamiento
+    perceptron.tamano_lote = tamano_lote
+    perceptron.configurar_historial(capacidad_historial, decimacion_historial)
+
+def entrenar_sin_interfaz(n_puntos=30, tasa_aprendizaje=0.1, max_iteraciones=100, n_prueba=10,
+                          modo_entrenamiento="secuencial", tamano_lote=None, verboso=False,
+                          n_caracteristicas=2, ruta_historial=None, capacidad_historial=1000,
+                          decimacion_historial=1, estrategia="fija", paciencia=None, ruido=0.0,
+                          instrumentacion=None, semilla=None, cache=None):
+    """Entrenar un ModeloPerceptron a máxima velocidad y devolver sus métricas.
+
+    Con semilla la corrida es reproducible y, si se pasa un CacheResultados,
+    una configuración ya entrenada con la misma versión del código se devuelve
+    desde disco sin reentrenar, con desde_cache=True y un mensaje a la
+    instrumentación.
+    """
+    clave = None
+    if cache is not None and semilla is not None:
+        clave = cache.clave(semilla=semilla, n_puntos=n_puntos, tasa_aprendizaje=tasa_aprendizaje,
+                            max_iteraciones=max_iteraciones, n_prueba=n_prueba,
+                            modo_entrenamiento=modo_entrenamiento, tamano_lote=tamano_lote,
+                            n_caracteristicas=n_caracteristicas, capacidad_historial=capacidad_historial,
+                            decimacion_historial=decimacion_historial, estrategia=estrategia,
+                            paciencia=paciencia, ruido=ruido)
+        guardado = cache.obtener(clave)
+        if guardado is not None:
+            metricas, historial = guardado
+            if ruta_historial:
+                np.savez_compressed(ruta_historial, **historial)
+            # tiempo_segundos es el de la corrida que se guardó, no el de esta llamada
+            if instrumentacion is not None:
+                instrumentacion.mensaje("info", f"Resultado desde la caché ({clave[:12]}): no se reentrena")
+            return {**metricas, "desde_cache": True}
+    
+    modelo = ModeloPerceptron(n_puntos=n_puntos, verboso=verboso, n_caracteristicas=n_caracteristicas,
+                              ruido=ruido, instrumentacion=instrumentacion, semilla=semilla)
+    _configurar_perceptron(modelo, tasa_aprendizaje, max_iteraciones, modo_entrenamiento,
+                           tamano_lote, capacidad_historial, decimacion_historial,
+                           estrategia, paciencia)
+    metricas = modelo.ejecutar_entrenamiento(n_prueba)
+    metricas["desde_cache"] = False
+    if ruta_historial:
+        modelo.exportar_historial(ruta_historial)
+    if clave is not None:
+        cache.guardar(clave, metricas, modelo.datos_historial())
+    return metricas
+
+def entrenar_ensamble(n_modelos=1000, n_puntos=30, tasa_aprendizaje=0.1, max_iteraciones=100,
+                      n_prueba=10, modo_entrenamiento="secuencial", tamano_lote=None,
+                      n_caracteristicas=2, ruido=0.0, semilla=None):
+    """Entrenar n_modelos perceptrones con pesos iniciales aleatorios sobre los mismos datos.
+
+    Devuelve la distribución de épocas hasta converger y de precisión; los
+    valores de cada modelo quedan en metricas["por_modelo"].
+    """
+    modelo = ModeloPerceptron(n_puntos=n_puntos, verboso=False, n_caracteristicas=n_caracteristicas,
+                              ruido=ruido, semilla=semilla)
+    ensamble = EnsamblePerceptrones(n_modelos, modelo.n_caracteristicas, tasa_aprendizaje,
+                                    generador=modelo.generador)
+    inicio = time.perf_counter()
+    ensamble.entrenar(modelo.motor, max_iteraciones, modo_entrenamiento, tamano_lote)
+    tiempo = time.perf_counter() - inicio
+    
+    prueba = modelo.agente_datos.generar_datos_prueba(n_prueba)
+    epocas = ensamble.epocas_convergencia
+    precision_entrenamiento = ensamble.precision(modelo.motor.caracteristicas, modelo.motor.etiquetas)
+    precision_prueba = ensamble.precision(prueba.caracteristicas, prueba.etiquetas_reales)
+    return {
+        "n_modelos": n_modelos,
+        "n_puntos": n_puntos,
+        "tasa_aprendizaje": tasa_aprendizaje,
+        "max_iteraciones": max_iteraciones,
+        "modelos_convergidos": int(np.count_nonzero(epocas >= 0)),
+        "epocas_convergencia": _distribucion(epocas[epocas >= 0]),
+        "precision_entrenamiento": _distribucion(precision_entrenamiento),
+        "precision_prueba": _distribucion(precision_prueba),
+        "tiempo_segundos": tiempo,
+        "por_modelo": {
+            "epocas_convergencia": epocas,
+            "precision_entrenamiento": precision_entrenamiento,
+            "precision_prueba": precision_prueba,
+            "pesos": ensamble.pesos,
+        },
+    }
+
+def entrenar_desde_disco(ruta, tasa_aprendizaje=0.1, max_iteraciones=100, tamano_fragmento=65536,
+                         barajar=False, ruta_prueba=None, modo_entrenamiento="secuencial",
+                         tamano_lote=None, verboso=False, n_caracteristicas=2, ruta_historial=None,
+                         capacidad_historial=1000, decimacion_historial=1, estrategia="fija",
+                         paciencia=None, instrumentacion=None, semilla=None):
+    """Entrenar por flujo desde un conjunto en disco más grande que la memoria"""
+    # n_caracteristicas sólo se usa para dar forma a los binarios crudos
+    generador = np.random.default_rng(semilla) if semilla is not None else None
+    fuente = FuenteDisco(ruta, tamano_fragmento, barajar, n_caracteristicas + 1, generador)
+    fuente_prueba = (FuenteDisco(ruta_prueba, tamano_fragmento, n_columnas=n_caracteristicas + 1)
+                     if ruta_prueba else None)
+    modelo = ModeloPerceptron(verboso=verboso, fuente=fuente, fuente_prueba=fuente_prueba,
+                              instrumentacion=instrumentacion, semilla=semilla)
+    _configurar_perceptron(modelo, tasa_aprendizaje, max_iteraciones, modo_entrenamiento,
+                           tamano_lote, capacidad_historial, decimacion_historial,
+                           estrategia, paciencia)
+    metricas = modelo.ejecutar_entrenamiento()
+    if ruta_historial:
+        modelo.exportar_historial(ruta_historial)
+    return metricas
+
+def reproducir_historial(ruta, intervalo_ms=50):
+    """Animar la evolución de la línea de decisión desde un historial exportado, sin reentrenar"""
+    plt = _pyplot()
+    from matplotlib.animation import FuncAnimation
+    
+    historial = HistorialPesos.cargar(ruta)
+    epocas, pesos, sesgos = historial["epocas"], historial["pesos"], historial["sesgos"]
+    
+    fig, ax = plt.subplots(figsize=(10, 8))
+    ax.set_xlim(-1.2, 1.2)
+    ax.set_ylim(-1.2, 1.2)
+    ax.set_xlabel('X')
+    ax.set_ylabel('Y')
+    ax.set_title('Perceptrón - Reproducción del Historial')
+    ax.grid(True, alpha=0.3)
+    
+    x_vals = np.array([-1, 1])
+    if "pendiente_real" in historial:
+        y_real = historial["pendiente_real"] * x_vals + historial["intercepto_real"]
+        ax.plot(x_vals, y_real, 'b--', label='Línea Real', alpha=0.7)
+    linea_decision, = ax.plot([], [], 'r-', linewidth=2, label='Línea de Decisión', animated=True)
+    texto_info = ax.text(0.02, 0.98, "", transform=ax.transAxes, verticalalignment='top',
+                         bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8), animated=True)
+    ax.legend()
+    
+    def dibujar_cuadro(i):
+        w1 = pesos[i, 0]
+        w2 = pesos[i, 1] if pesos.shape[1] > 1 else 0.0
+        if w2 != 0:
+            linea_decision.set_data(x_vals, (-w1 * x_vals - sesgos[i]) / w2)
+        texto_info.set_text(f"Iteración: {epocas[i]}\nw1={w1:.3f}, w2={w2:.3f}, b={sesgos[i]:.3f}")
+        return linea_decision, texto_info
+    
+    animacion = FuncAnimation(fig, dibujar_cuadro, frames=len(epocas), interval=intervalo_ms,
+                              blit=True, repeat=False)
+    plt.show()
+    return animacion
 
 # Función principal
-def ejecutar_simulacion():
-    modelo = ModeloPerceptron(n_puntos=30)
+def ejecutar_simulacion(n_puntos=30, n_caracteristicas=2, instrumentacion=None, semilla=None):
+    # Con instrumentación propia, los mensajes se muestran sólo si incluye un sumidero de consola
+    modelo = ModeloPerceptron(n_puntos=n_puntos, n_caracteristicas=n_caracteristicas,
+                              verboso=instrumentacion is None, instrumentacion=instrumentacion,
+                              semilla=semilla)
     modelo.configurar_visualizacion()
-    plt.show()
+    _pyplot().show()
+    if instrumentacion is not None:
+        instrumentacion.cerrar()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perceptrón basado en agentes (MESA)")
+    parser.add_argument("--sin-interfaz", action="store_true",
+                        help="entrenar sin matplotlib y emitir las métricas en JSON")
+    parser.add_argument("--puntos", type=int, default=30, help="puntos de entrenamiento")
+    parser.add_argument("--caracteristicas", type=int, default=2,
+                        help="dimensión de los datos (la visualización proyecta las dos primeras)")
+    parser.add_argument("--tasa", type=float, default=0.1, help="tasa de aprendizaje")
+    parser.add_argument("--iteraciones", type=int, default=100, help="iteraciones máximas")
+    parser.add_argument("--prueba", type=int, default=10, help="puntos de prueba")
+    parser.add_argument("--modo", choices=["secuencial", "lotes"], default="secuencial",
+                        help="regla de actualización por punto o por mini-lotes")
+    parser.add_argument("--lote", type=int, default=None, help="tamaño de mini-lote (modo lotes)")
+    parser.add_argument("--verboso", action="store_true", help="mostrar el progreso por época")
+    parser.add_argument("--nivel", choices=NIVELES, default=None,
+                        help="mostrar los mensajes de progreso desde este nivel")
+    parser.add_argument("--registro", metavar="RUTA",
+                        help="escribir tiempos por fase y métricas por época en JSON lines")
+    parser.add_argument("--datos", help="entrenar por flujo desde un .npy (o binario) en disco")
+    parser.add_argument("--datos-prueba", help="conjunto de prueba en disco (con --datos)")
+    parser.add_argument("--fragmento", type=int, default=65536, help="filas por fragmento leído de disco")
+    parser.add_argument("--barajar", action="store_true", help="barajar por bloques en cada época")
+    parser.add_argument("--generar-datos", metavar="RUTA",
+                        help="escribir --puntos puntos sintéticos en un .npy y salir")
+    parser.add_argument("--exportar-historial", metavar="RUTA",
+                        help="guardar la trayectoria de pesos en un .npz comprimido")
+    parser.add_argument("--capacidad-historial", type=int, default=1000,
+                        help="épocas que guarda el búfer circular del historial")
+    parser.add_argument("--decimacion", type=int, default=1, help="guardar una de cada k épocas")
+    parser.add_argument("--estrategia", choices=AgentePerceptron.ESTRATEGIAS, default="fija",
+                        help="orden fijo, barajado por época, bolsillo o promediado")
+    parser.add_argument("--paciencia", type=int, default=None,
+                        help="detener tras k épocas sin mejorar el número de errores")
+    parser.add_argument("--ruido", type=float, default=0.0,
+                        help="fracción de etiquetas invertidas (datos no separables)")
+    parser.add_argument("--ensamble", type=int, metavar="K",
+                        help="entrenar K perceptrones a la vez y resumir su convergencia")
+    parser.add_argument("--reproducir", metavar="RUTA",
+                        help="animar un historial exportado sin reentrenar")
+    parser.add_argument("--semilla", type=int, default=None, help="semilla de los generadores del modelo")
+    parser.add_argument("--cache", metavar="DIRECTORIO",
+                        help="reutilizar corridas ya entrenadas (requiere --semilla)")
+    parser.add_argument("--cache-max-mb", type=float, default=256,
+                        help="tamaño máximo del directorio de caché")
+    args = parser.parse_args(argv)
+    if args.caracteristicas < 2:
+        parser.error("--caracteristicas debe ser al menos 2")
+    
+    if args.reproducir:
+        reproducir_historial(args.reproducir)
+        return
+    
+    if args.generar_datos:
+        modelo = ModeloPerceptron(n_puntos=0, n_caracteristicas=args.caracteristicas,
+                                  semilla=args.semilla)
+        modelo.agente_datos.generar_archivo(args.generar_datos, args.puntos)
+        return
+    
+    if args.ensamble:
+        metricas = entrenar_ensamble(args.ensamble, args.puntos, args.tasa, args.iteraciones,
+                                     args.prueba, args.modo, args.lote, args.caracteristicas, args.ruido,
+                                     args.semilla)
+        del metricas["por_modelo"]
+        print(json.dumps(metricas))
+        return
+    
+    instrumentacion = None
+    if args.nivel or args.registro:
+        instrumentacion = Instrumentacion()
+        if args.nivel:
+            instrumentacion.agregar(SumideroConsola(args.nivel))
+        if args.registro:
+            instrumentacion.agregar(SumideroJSONL(args.registro))
+    
+    if args.datos:
+        metricas = entrenar_desde_disco(args.datos, args.tasa, args.iteraciones, args.fragmento,
+                                        args.barajar, args.datos_prueba, args.modo, args.lote,
+                                        args.verboso, args.caracteristicas, args.exportar_historial,
+                                        args.capacidad_historial, args.decimacion, args.estrategia,
+                                        args.paciencia, instrumentacion, args.semilla)
+        if instrumentacion is not None:
+            instrumentacion.cerrar()
+        print(json.dumps(metricas))
+        return
+    
+    cache = CacheResultados(args.cache, int(args.cache_max_mb * 2**20)) if args.cache else None
+    
+    if not args.sin_interfaz:
+        ejecutar_simulacion(args.puntos, args.caracteristicas, instrumentacion, args.semilla)
+        return
+    
+    metricas = entrenar_sin_interfaz(args.puntos, args.tasa, args.iteraciones, args.prueba,
+                                     args.modo, args.lote, args.verboso, args.caracteristicas,
+                                     args.exportar_historial, args.capacidad_historial,
+                                     args.decimacion, args.estrategia, args.paciencia, args.ruido,
+                                     instrumentacion, args.semilla, cache)
+    if instrumentacion is not None:
+        instrumentacion.cerrar()
+    print(json.dumps(metricas))
 
 if __name__ == "__main__":
-    ejecutar_simulacion()
\ No newline at end of file
+    main()
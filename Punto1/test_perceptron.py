@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from cache_resultados import CacheResultados
+from instrumentacion import Instrumentacion, SumideroMemoria
+from perceptron import EnsamblePerceptrones, ModeloPerceptron, entrenar_desde_disco, entrenar_sin_interfaz
+
+def datos(n_puntos, ruido=0.0, semilla=0, n_caracteristicas=2):
+    modelo = ModeloPerceptron(n_puntos=n_puntos, verboso=False, n_caracteristicas=n_caracteristicas,
+                              ruido=ruido, semilla=semilla)
+    return modelo.motor
+
+def epoca_punto_a_punto(caracteristicas, etiquetas, pesos, sesgo, tasa_aprendizaje):
+    """Referencia: la regla del perceptrón recorriendo los puntos uno a uno"""
+    pesos = np.array(pesos, dtype=np.float64)
+    errores = 0
+    for x, etiqueta in zip(caracteristicas, etiquetas):
+        # Mismo orden de operaciones que MotorEntrenamiento.suma_ponderada
+        suma = x[0] * pesos[0]
+        for j in range(1, len(x)):
+            suma += x[j] * pesos[j]
+        suma += sesgo
+        prediccion = 1 if suma >= 0 else -1
+        if prediccion != etiqueta:
+            errores += 1
+            paso = tasa_aprendizaje * (int(etiqueta) - prediccion)
+            pesos += paso * x
+            sesgo += paso
+    return pesos, sesgo, errores
+
+@pytest.mark.parametrize("ruido", [0.0, 0.05, 0.3])
+@pytest.mark.parametrize("n_puntos", [1, 63, 64, 65, 1000])
+def test_epoca_secuencial_igual_a_punto_a_punto(n_puntos, ruido):
+    motor = datos(n_puntos, ruido)
+    pesos, sesgo = np.array([0.3, -0.7]), 0.1
+    esperado = (pesos, sesgo)
+    for _ in range(5):
+        predicciones = np.zeros(len(motor), dtype=np.int64)
+        pesos, sesgo, errores = motor.epoca_secuencial(pesos, sesgo, 0.1, predicciones)
+        pesos_ref, sesgo_ref, errores_ref = epoca_punto_a_punto(
+            motor.caracteristicas, motor.etiquetas, *esperado, 0.1)
+        esperado = (pesos_ref, sesgo_ref)
+        assert pesos.tolist() == pesos_ref.tolist()
+        assert sesgo == sesgo_ref
+        assert errores == errores_ref
+        # Las predicciones posteriores a la última actualización valen para los pesos finales
+        despues = slice(motor.ultima_actualizacion + 1, None)
+        assert np.array_equal(predicciones[despues], motor.predecir(pesos, sesgo)[despues])
+
+def test_menos_de_dos_caracteristicas():
+    with pytest.raises(ValueError):
+        ModeloPerceptron(n_puntos=10, verboso=False, n_caracteristicas=1)
+    with pytest.raises(ValueError):
+        entrenar_sin_interfaz(n_puntos=10, n_caracteristicas=1)
+
+@pytest.mark.parametrize("estrategia", ["fija", "barajada", "promediado"])
+def test_evaluaciones_por_epoca(estrategia):
+    # Cada época evalúa al menos una vez cada punto, también sobre el motor reordenado
+    metricas = entrenar_sin_interfaz(n_puntos=500, max_iteraciones=20, ruido=0.05,
+                                     estrategia=estrategia, semilla=4)
+    assert metricas["iteraciones"] == 20
+    assert metricas["evaluaciones_por_epoca"] >= 1
+
+def test_semilla_reproduce_la_corrida():
+    a = entrenar_sin_interfaz(n_puntos=200, estrategia="barajada", ruido=0.05, semilla=9)
+    b = entrenar_sin_interfaz(n_puntos=200, estrategia="barajada", ruido=0.05, semilla=9)
+    assert a["pesos"] == b["pesos"] and a["sesgo"] == b["sesgo"]
+
+@pytest.mark.parametrize("tamano_fragmento", [7, 64, 1000])
+def test_disco_igual_a_memoria(tmp_path, tamano_fragmento):
+    # Misma semilla: mismos datos y mismos pesos iniciales en ambos caminos
+    memoria = entrenar_sin_interfaz(n_puntos=300, max_iteraciones=30, ruido=0.02, semilla=5)
+    modelo = ModeloPerceptron(n_puntos=300, verboso=False, ruido=0.02, semilla=5)
+    ruta = tmp_path / "datos.npy"
+    np.save(ruta, np.column_stack([modelo.motor.caracteristicas, modelo.motor.etiquetas]))
+    disco = entrenar_desde_disco(str(ruta), max_iteraciones=30, tamano_fragmento=tamano_fragmento,
+                                 semilla=5)
+    assert disco["pesos"] == memoria["pesos"]
+    assert disco["sesgo"] == memoria["sesgo"]
+
+def test_generar_archivo_separable(tmp_path):
+    modelo = ModeloPerceptron(n_puntos=1, verboso=False, semilla=2)
+    ruta = tmp_path / "datos.npy"
+    modelo.agente_datos.generar_archivo(str(ruta), 2000, tamano_fragmento=300)
+    metricas = entrenar_desde_disco(str(ruta), max_iteraciones=500, tamano_fragmento=256, semilla=2)
+    assert metricas["n_puntos"] == 2000
+    assert metricas["convergio"]
+    assert metricas["precision_entrenamiento"] == 100.0
+
+def test_ensamble_igual_a_modelos_individuales():
+    # Cada fila del ensamble sigue la trayectoria del motor con esos pesos iniciales
+    motor = datos(400, semilla=1)
+    iniciales = np.random.default_rng(3).uniform(-1, 1, size=(6, 3))
+    ensamble = EnsamblePerceptrones(len(iniciales), 2, 0.1, pesos=iniciales)
+    ensamble.entrenar(motor, max_iteraciones=25)
+    for fila, pesos_ensamble, epoca_ensamble in zip(iniciales, ensamble.pesos, ensamble.epocas_convergencia):
+        pesos, sesgo = fila[:2], fila[2]
+        epoca_convergencia = -1
+        for epoca in range(1, 26):
+            pesos, sesgo, _ = motor.epoca_secuencial(pesos, sesgo, 0.1)
+            if motor.contar_errores(pesos, sesgo) == 0:
+                epoca_convergencia = epoca
+                break
+        assert pesos_ensamble.tolist() == [*pesos, sesgo]
+        assert epoca_ensamble == epoca_convergencia
+
+def test_cache_devuelve_la_misma_corrida(tmp_path):
+    cache = CacheResultados(tmp_path)
+    sumidero = SumideroMemoria()
+    fresca = entrenar_sin_interfaz(n_puntos=100, semilla=8, cache=cache)
+    guardada = entrenar_sin_interfaz(n_puntos=100, semilla=8, cache=cache,
+                                     instrumentacion=Instrumentacion(sumidero))
+    assert not fresca["desde_cache"] and guardada["desde_cache"]
+    assert guardada["pesos"] == fresca["pesos"]
+    assert any("caché" in evento["texto"] for evento in sumidero.eventos["mensaje"])
@@ -0,0 +1,337 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from calculadora import (FUNCIONES_OPERACION, CacheExpresiones, MensajeTarea, ModeloCalculadora,
+                          compilar_expresion, obtener_grafo)
+
+# Expresión de cada evaluación en la suite de mensajes: 4 tareas en 3 niveles
+EXPRESION_MENSAJES = "1+2*3-4/5"
+# Exponente de las potencias enteras de la suite de trabajadores (unos ms por tarea)
+EXPONENTE_TRABAJADORES = 30000
+# Operadores de los corpus generados (las potencias con exponente pequeño, ver generar_termino)
+OPERADORES_CORPUS = "+-*/^"
+
+# Campos que identifican un resultado al compararlo con la base
+CAMPOS_COMPARACION = ("fase", "evaluaciones", "procesos", "profundidad", "ancho", "repeticion", "optimizar")
+
+# cronometrar y comparar son idénticas en Punto1/benchmark.py y Punto2/benchmark.py
+# (los dos proyectos no comparten módulos): un cambio en una va también en la otra
+def cronometrar(funcion, repeticiones=5, preparar=None):
+    """Mejor tiempo (en segundos) de varias ejecuciones de funcion(); preparar() no se mide"""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        if preparar is not None:
+            preparar()
+        gc.collect()
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+def medir_mensajes(tamanos, repeticiones=5, expresion=EXPRESION_MENSAJES):
+    """Mensajes por segundo del bus con `n` evaluaciones simultáneas en un modelo.
+
+    Cada tarea genera un mensaje de tarea y uno de resultado; con n
+    evaluaciones cada paso mueve del orden de n mensajes. Se mide sólo el
+    avance del modelo, no el alta de las expresiones.
+    """
+    cache = CacheExpresiones(capacidad=1)
+    n_tareas = len(cache.obtener(expresion, compilar_expresion).tareas)
+    resultados = []
+    for n in tamanos:
+        estado = {}
+
+        def preparar():
+            modelo = ModeloCalculadora(cache_expresiones=cache, verboso=False)
+            for _ in range(n):
+                modelo.agente_es.agregar_expresion(expresion)
+            estado["modelo"] = modelo
+
+        def avanzar():
+            modelo = estado["modelo"]
+            while modelo.agente_es.evaluaciones:
+                modelo.step()
+
+        segundos = cronometrar(avanzar, repeticiones, preparar)
+        mensajes = 2 * n_tareas * n
+        resultados.append({
+            "fase": "mensajes",
+            "evaluaciones": n,
+            "mensajes": mensajes,
+            "segundos": segundos,
+            "mensajes_por_segundo": mensajes / segundos,
+        })
+    return resultados
+
+def bus_diccionarios(n, operacion="suma"):
+    """Réplica del bus anterior: mensajes dict, bandejas lista con pop(0) e isinstance al entregar"""
+    funcion = FUNCIONES_OPERACION[operacion]
+    bandejas = {"agente_suma": [], "agente_es": []}
+    pendientes = []
+
+    def enviar_mensaje(mensaje, destinatario_id):
+        pendientes.append((destinatario_id, mensaje))
+
+    def entregar_mensajes():
+        for destinatario_id, mensaje in pendientes:
+            if destinatario_id in bandejas:
+                bandeja = bandejas[destinatario_id]
+                if isinstance(bandeja, list):
+                    bandeja.append(mensaje)
+        pendientes.clear()
+
+    def procesar_tarea(mensaje):
+        resultado = funcion(mensaje["operando_izq"], mensaje["operando_der"])
+        enviar_mensaje({"tipo": "resultado", "id_tarea": mensaje["id_tarea"],
+                        "valor": resultado, "de": "agente_suma"}, mensaje["respuesta_a"])
+
+    for i in range(n):
+        enviar_mensaje({"tipo": "tarea", "id_tarea": (0, i), "operando_izq": i,
+                        "operando_der": 1, "respuesta_a": "agente_es"}, "agente_suma")
+    inicio = time.perf_counter()
+    entregar_mensajes()
+    bandeja = bandejas["agente_suma"]
+    while bandeja:
+        mensaje = bandeja.pop(0)
+        if mensaje["tipo"] == "tarea":
+            procesar_tarea(mensaje)
+    entregar_mensajes()
+    return time.perf_counter() - inicio
+
+def bus_actual(n):
+    """Mismo recorrido con el bus del modelo: mensajes tupla, deque y tabla de entrega"""
+    modelo = ModeloCalculadora(cache_expresiones=None, verboso=False)
+    agente = modelo.agentes["agente_suma"]
+    for i in range(n):
+        modelo.enviar_mensaje(MensajeTarea(((0, i), i, 1, "agente_es")), "agente_suma")
+    inicio = time.perf_counter()
+    modelo.entregar_mensajes()
+    agente.step()
+    modelo.entregar_mensajes()
+    return time.perf_counter() - inicio
+
+def medir_bus(tamanos, repeticiones=5):
+    """Mensajes por segundo de un paso con n tareas para un agente, con ambos formatos"""
+    resultados = []
+    for n in tamanos:
+        for formato, funcion in (("diccionarios", bus_diccionarios), ("tuplas", bus_actual)):
+            segundos = float("inf")
+            for _ in range(repeticiones):
+                gc.collect()
+                segundos = min(segundos, funcion(n))
+            resultados.append({
+                "fase": f"bus_{formato}",
+                "evaluaciones": n,
+                "mensajes": 2 * n,
+                "segundos": segundos,
+                "mensajes_por_segundo": 2 * n / segundos,
+            })
+    return resultados
+
+def medir_trabajadores(procesos, n_tareas=2000, repeticiones=3, exponente=EXPONENTE_TRABAJADORES):
+    """Tareas por segundo de un lote de potencias grandes con p agentes de potencia en p procesos.
+    
+    Con p = 0 la potencia se calcula en el propio proceso del modelo. La
+    aceleración es relativa a la primera configuración medida; sólo puede
+    superar 1 con más de un núcleo (ver "nucleos" en los metadatos).
+    """
+    expresiones = [f"{i + 2}^{exponente}" for i in range(n_tareas)]
+    resultados = []
+    for p in procesos:
+        with ModeloCalculadora(verboso=False, trabajadores={"potencia": max(p, 1)}, procesos=p) as modelo:
+            # Una corrida previa arranca los procesos y compila las expresiones
+            modelo.ejecutar_lote(expresiones)
+            segundos = cronometrar(lambda: modelo.ejecutar_lote(expresiones), repeticiones)
+        resultados.append({
+            "fase": "trabajadores",
+            "procesos": p,
+            "evaluaciones": n_tareas,
+            "segundos": segundos,
+            "tareas_por_segundo": n_tareas / segundos,
+            "aceleracion": resultados[0]["segundos"] / segundos if resultados else 1.0,
+        })
+    return resultados
+
+def generar_termino(profundidad, rng):
+    """Árbol binario completo de la profundidad dada con operadores y números al azar"""
+    if profundidad == 0:
+        return str(rng.randint(1, 9))
+    operador = rng.choice(OPERADORES_CORPUS)
+    izquierda = generar_termino(profundidad - 1, rng)
+    # Exponentes de una cifra: las potencias no dominan el tiempo
+    derecha = str(rng.randint(0, 3)) if operador == "^" else generar_termino(profundidad - 1, rng)
+    return f"({izquierda}{operador}{derecha})"
+
+def generar_corpus(n_expresiones, profundidad=3, ancho=1, repeticion=0.0, semilla=0):
+    """Corpus reproducible de expresiones.
+    
+    Cada expresión suma (o resta) `ancho` términos independientes de la
+    profundidad dada, combinados de dos en dos; una fracción `repeticion`
+    de las expresiones repite una anterior (acierto en la caché).
+    """
+    rng = random.Random(semilla)
+    corpus = []
+    for _ in range(n_expresiones):
+        if corpus and rng.random() < repeticion:
+            corpus.append(rng.choice(corpus))
+            continue
+        nivel = [generar_termino(profundidad, rng) for _ in range(ancho)]
+        while len(nivel) > 1:
+            siguiente = [f"({nivel[i]}{rng.choice('+-')}{nivel[i + 1]})" for i in range(0, len(nivel) - 1, 2)]
+            if len(nivel) % 2:
+                siguiente.append(nivel[-1])
+            nivel = siguiente
+        corpus.append(nivel[0])
+    return corpus
+
+def medir_corpus(configuraciones, n_expresiones=1000, repeticiones=5, repeticion=0.0, optimizar=False,
+                 semilla=0):
+    """Expresiones por segundo, pasos y mensajes por expresión de corpus (profundidad, ancho).
+    
+    Cada corpus se evalúa como un lote en un modelo nuevo. Los tiempos se
+    miden sin métricas; una corrida aparte con ModeloCalculadora(metricas=True)
+    da pasos, mensajes y el desglose por agente. La compilación se mide aparte
+    (las corridas toman los grafos de la caché).
+    """
+    resultados = []
+    for profundidad, ancho in configuraciones:
+        corpus = generar_corpus(n_expresiones, profundidad, ancho, repeticion, semilla)
+        cache = CacheExpresiones(capacidad=len(corpus))
+        inicio = time.perf_counter()
+        grafos = [obtener_grafo(expresion, cache, optimizar) for expresion in corpus]
+        segundos_compilacion = time.perf_counter() - inicio
+        max_pasos = 2 * max(grafo.altura() for grafo in grafos)
+        estado = {}
+        
+        def preparar():
+            estado["modelo"] = ModeloCalculadora(cache_expresiones=cache, verboso=False, optimizar=optimizar)
+        
+        segundos = cronometrar(lambda: estado["modelo"].ejecutar_lote(corpus, max_pasos), repeticiones, preparar)
+        
+        # Pasos hasta el resultado de cada expresión y métricas por agente
+        modelo = ModeloCalculadora(cache_expresiones=cache, verboso=False, metricas=True, optimizar=optimizar)
+        pasos = sum(modelo.metricas.pasos for _ in modelo.resultados_a_medida(corpus, max_pasos))
+        metricas = modelo.metricas.estadisticas()
+        resultados.append({
+            "fase": "corpus",
+            "profundidad": profundidad,
+            "ancho": ancho,
+            "repeticion": repeticion,
+            "optimizar": optimizar,
+            "evaluaciones": n_expresiones,
+            "segundos": segundos,
+            "expresiones_por_segundo": n_expresiones / segundos,
+            "segundos_compilacion": segundos_compilacion,
+            "expresiones_compiladas_por_segundo": len(cache.grafos) / segundos_compilacion,
+            "pasos_por_expresion": pasos / n_expresiones,
+            "mensajes_por_expresion": metricas["mensajes_entregados"] / n_expresiones,
+            "tareas_por_expresion": sum(len(grafo.tareas) for grafo in grafos
+                                        if grafo.tareas[grafo.id_raiz]["operacion"] != "constante") / n_expresiones,
+            "metricas": metricas,
+        })
+    return resultados
+
+def comparar(resultados, base, umbral, minimo_segundos=1e-4, campos=("fase",)):
+    """Resultados más lentos que la base en más de `umbral` (fracción), emparejados por `campos`.
+
+    Las diferencias menores que minimo_segundos se consideran ruido de medición.
+    """
+    def clave(r):
+        return tuple(r.get(campo) for campo in campos)
+
+    tiempos_base = {clave(r): r["segundos"] for r in base["resultados"]}
+    regresiones = []
+    for resultado in resultados:
+        anterior = tiempos_base.get(clave(resultado))
+        diferencia = resultado["segundos"] - (anterior or 0)
+        if anterior and diferencia > anterior * umbral and diferencia > minimo_segundos:
+            regresiones.append({**resultado, "segundos_base": anterior,
+                                "variacion": resultado["segundos"] / anterior - 1})
+    return regresiones
+
+def revision_git():
+    """Commit actual del repositorio (None fuera de git), para seguir regresiones entre commits"""
+    try:
+        salida = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return salida.stdout.strip() or None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de la calculadora de agentes")
+    parser.add_argument("suite", nargs="?", choices=["mensajes", "bus", "trabajadores", "corpus"],
+                        default="mensajes")
+    parser.add_argument("--evaluaciones", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="evaluaciones simultáneas (mensajes), tareas por paso (bus) "
+                             "o expresiones por lote (trabajadores y corpus, el último valor)")
+    parser.add_argument("--procesos", type=int, nargs="+", default=[0, 1, 2, 4],
+                        help="procesos de los agentes de potencia (trabajadores)")
+    parser.add_argument("--profundidades", type=int, nargs="+", default=[1, 3, 5],
+                        help="profundidad de los términos de cada expresión (corpus)")
+    parser.add_argument("--anchos", type=int, nargs="+", default=[1, 4, 16],
+                        help="términos independientes por expresión (corpus)")
+    parser.add_argument("--repeticion", type=float, default=0.0,
+                        help="fracción de expresiones repetidas en el corpus")
+    parser.add_argument("--optimizar", action="store_true",
+                        help="compilar el corpus con la optimización (plegado de constantes)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--salida", help="guardar los resultados en un archivo JSON")
+    parser.add_argument("--comparar", metavar="BASE", help="JSON de una corrida anterior")
+    parser.add_argument("--umbral", type=float, default=0.2,
+                        help="fracción de enlentecimiento tolerada frente a la base")
+    parser.add_argument("--minimo", type=float, default=1e-4,
+                        help="diferencia absoluta (s) por debajo de la cual no hay regresión")
+    args = parser.parse_args(argv)
+
+    if args.suite == "mensajes":
+        resultados = medir_mensajes(args.evaluaciones, args.repeticiones)
+    elif args.suite == "bus":
+        resultados = medir_bus(args.evaluaciones, args.repeticiones)
+    elif args.suite == "trabajadores":
+        resultados = medir_trabajadores(args.procesos, args.evaluaciones[-1], args.repeticiones)
+    else:
+        configuraciones = [(p, a) for p in args.profundidades for a in args.anchos]
+        resultados = medir_corpus(configuraciones, args.evaluaciones[-1], args.repeticiones, args.repeticion,
+                                  args.optimizar, args.semilla)
+
+    informe = {
+        "suite": args.suite,
+        "metadatos": {
+            "python": platform.python_version(),
+            "maquina": platform.machine(),
+            "nucleos": os.cpu_count(),
+            "repeticiones": args.repeticiones,
+            "commit": revision_git(),
+        },
+        "resultados": resultados,
+    }
+    if args.salida:
+        with open(args.salida, "w") as archivo:
+            json.dump(informe, archivo, indent=2)
+    else:
+        for resultado in resultados:
+            print(json.dumps(resultado))
+
+    if args.comparar:
+        with open(args.comparar) as archivo:
+            regresiones = comparar(resultados, json.load(archivo), args.umbral, args.minimo,
+                                   CAMPOS_COMPARACION)
+        for regresion in regresiones:
+            detalle = "".join(f" {c}={regresion[c]}" for c in ("procesos", "profundidad", "ancho") if c in regresion)
+            print(f"REGRESIÓN {regresion['fase']} n={regresion['evaluaciones']}{detalle}: "
+                  f"{regresion['segundos_base']:.6f} s -> {regresion['segundos']:.6f} s "
+                  f"(+{regresion['variacion']:.0%})", file=sys.stderr)
+        if regresiones:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,190 +1,1061 @@
 from mesa import Agent, Model
 from mesa.time import BaseScheduler
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import operator
+import random
 import re
-import uuid
+import sys
+import time
+
+import numpy as np
+
+PATRON_TOKEN = re.compile(r'(\d+\.?\d*|[A-Za-z_]\w*|[+\-*/^()])')
+PATRON_NUMERO = re.compile(r'\d+\.?\d*')
+PATRON_VARIABLE = re.compile(r'[A-Za-z_]\w*')
+
+MENSAJE_DIVISION_CERO = "División por cero"
+
+def dividir(a, b):
+    if b == 0:
+        raise ZeroDivisionError(MENSAJE_DIVISION_CERO)
+    return a / b
+
+# Operadores en el orden en que el planificador activa a sus agentes
+OPERACIONES = {
+    "+": "suma",
+    "-": "resta",
+    "*": "multiplicacion",
+    "/": "division",
+    "^": "potencia"
+}
+FUNCIONES_OPERACION = {
+    "suma": operator.add,
+    "resta": operator.sub,
+    "multiplicacion": operator.mul,
+    "division": dividir,
+    "potencia": operator.pow
+}
+ORDEN_OPERACION = {nombre: i for i, nombre in enumerate(OPERACIONES.values())}
+ORDEN_NOMBRE = list(OPERACIONES.values())
+# Versiones vectoriales para procesar lotes de tareas; la potencia queda escalar
+# (enteros exactos, exponentes negativos y resultados complejos)
+FUNCIONES_VECTORIALES = {
+    "suma": np.add,
+    "resta": np.subtract,
+    "multiplicacion": np.multiply,
+    "division": np.divide
+}
+# Tareas en la bandeja a partir de las cuales conviene el lote vectorial
+TAMANO_MINIMO_LOTE = 128
+# Tareas mínimas de un paso para mandarlas al proceso del agente (cada envío tiene un costo fijo)
+TAMANO_MINIMO_PROCESO = 64
+# Los enteros menores que 2^53 en valor absoluto son exactos en float64
+LIMITE_ENTERO_EXACTO = 2.0 ** 53
+# Potencia de Python elemento a elemento sobre arreglos (np.power no redondea igual)
+POTENCIA_EXACTA = np.frompyfunc(operator.pow, 2, 1)
+
+# Posición de otra tarea como operando en el programa compilado de un grafo
+class Referencia(int):
+    __slots__ = ()
+
+# Operando con nombre en una expresión; su valor se liga al evaluar
+class Variable:
+    __slots__ = ("nombre",)
+    
+    def __init__(self, nombre):
+        self.nombre = nombre
+    
+    def __eq__(self, otro):
+        return otro.__class__ is Variable and otro.nombre == self.nombre
+    
+    def __hash__(self):
+        return hash((Variable, self.nombre))
+    
+    def __repr__(self):
+        return f"Variable({self.nombre!r})"
+
+# Resultado de evaluar una expresión sobre columnas de numpy
+class ResultadoColumnas:
+    def __init__(self, valores, errores, con_valor):
+        # valores: float64 (NaN donde no hay valor; object si algún resultado no es
+        # float, p. ej. enteros o complejos); errores: "ERROR: ..." o None;
+        # con_valor: elementos con resultado numérico dentro de max_pasos
+        self.valores = valores
+        self.errores = errores
+        self.con_valor = con_valor
+    
+    def escalar(self, indice):
+        """Resultado de un elemento tal como lo daría la evaluación escalar"""
+        if self.errores[indice] is not None:
+            return self.errores[indice]
+        if self.con_valor[indice]:
+            valor = self.valores[indice]
+            return valor.item() if isinstance(valor, np.generic) else valor
+        return None
+
+# Grafo de tareas compilado a partir de una expresión
+class GrafoTareas:
+    def __init__(self, tareas, id_raiz, eliminadas=0):
+        self.tareas = tareas
+        self.id_raiz = id_raiz
+        # Altura de cada tarea: fija el paso en que llega su evento (2 por nivel)
+        self.alturas = self.calcular_alturas(tareas)
+        # Tareas que esperan el resultado de cada tarea (una entrada por operando),
+        # operandos de otras tareas que le faltan a cada una y orden de creación
+        self.dependencias = {}
+        self.faltantes = {}
+        self.posiciones = {}
+        variables = {}
+        for posicion, (id_tarea, tarea) in enumerate(tareas.items()):
+            self.posiciones[id_tarea] = posicion
+            self.faltantes[id_tarea] = 0
+            for operando in [tarea["izquierda"], tarea["derecha"]]:
+                if isinstance(operando, str) and operando in tareas:
+                    self.dependencias.setdefault(operando, []).append(id_tarea)
+                    self.faltantes[id_tarea] += 1
+                elif operando.__class__ is Variable:
+                    variables[operando.nombre] = None
+        # Nombres de las variables, en orden de aparición
+        self.variables = tuple(variables)
+        # Tareas sin dependencias, listas desde el inicio
+        self.iniciales = [id_tarea for id_tarea, n in self.faltantes.items() if n == 0]
+        self.programa = None
+        # Tareas que eliminó la optimización al compilar
+        self.eliminadas = eliminadas
+    
+    @staticmethod
+    def calcular_alturas(tareas):
+        # Nivel de cada tarea (las constantes, 0)
+        alturas = {}
+        for id_tarea, tarea in tareas.items():
+            if tarea["operacion"] == "constante":
+                alturas[id_tarea] = 0
+                continue
+            alturas[id_tarea] = 1 + max((alturas[o] for o in (tarea["izquierda"], tarea["derecha"])
+                                         if isinstance(o, str) and o in alturas), default=0)
+        return alturas
+    
+    def altura(self):
+        """Niveles de tareas: la evaluación con agentes tarda 2 pasos por nivel (0 si es constante)"""
+        return max(self.alturas.values())
+    
+    def compilar_programa(self):
+        # Una instrucción por tarea con agente: (función, orden del agente, operandos, es_raiz,
+        # altura sin optimizar).
+        # Las referencias a otra tarea son Referencia(posición), distinguibles de los
+        # enteros literales o ligados a variables (que pueden ser negativos)
+        posiciones = {}
+        programa = []
+        for id_tarea, tarea in self.tareas.items():
+            nombre = OPERACIONES.get(tarea["operacion"])
+            if nombre is None:
+                continue  # Sin agente para el operador: la tarea nunca se envía
+            operandos = []
+            for operando in (tarea["izquierda"], tarea["derecha"]):
+                if isinstance(operando, str) and operando in self.tareas:
+                    # Una referencia a una tarea sin agente nunca se resuelve
+                    operando = Referencia(posiciones[operando]) if operando in posiciones else None
+                operandos.append(operando)
+            posiciones[id_tarea] = len(programa)
+            programa.append((FUNCIONES_OPERACION[nombre], ORDEN_OPERACION[nombre],
+                             operandos[0], operandos[1], id_tarea == self.id_raiz, self.alturas[id_tarea]))
+        return programa
+    
+    def verificar_variables(self, variables):
+        faltantes = [nombre for nombre in self.variables if nombre not in (variables or {})]
+        if faltantes:
+            raise ValueError(f"Variable sin valor: {', '.join(faltantes)}")
+    
+    def enlazar(self, variables):
+        """Programa con cada variable sustituida por su valor"""
+        self.verificar_variables(variables)
+        def valor(operando):
+            return variables[operando.nombre] if operando.__class__ is Variable else operando
+        return [(funcion, orden, valor(izquierda), valor(derecha), es_raiz, altura)
+                for funcion, orden, izquierda, derecha, es_raiz, altura in self.programa]
+    
+    def evaluar(self, max_pasos=100, variables=None):
+        """Evaluar el grafo en una sola pasada, con el resultado que darían los agentes.
+        
+        Las tareas se recorren en orden de creación (orden RPN, que ya es
+        topológico). Una tarea de altura h se resuelve en el paso 2h del
+        modelo, así que se reproduce qué evento termina la evaluación: el de
+        menor altura y, a igual altura, el último que procesaría el agente E/S
+        (por orden de agente y, dentro de un agente, de creación: el agente
+        E/S envía las tareas listas de cada paso en ese orden). Las alturas
+        son las del grafo sin optimizar: el resultado no depende de la
+        optimización.
+        """
+        raiz = self.tareas[self.id_raiz]
+        if raiz["operacion"] == "constante":
+            if raiz["izquierda"].__class__ is Variable:
+                self.verificar_variables(variables)
+                return variables[raiz["izquierda"].nombre]
+            return raiz["izquierda"]
+        if self.programa is None:
+            self.programa = self.compilar_programa()
+        programa = self.enlazar(variables) if self.variables else self.programa
+        
+        # Valor y altura por posición en el programa (0: la tarea no llega a resolverse)
+        valores = [None] * len(programa)
+        alturas = [0] * len(programa)
+        # Evento que termina la evaluación: (altura, orden del agente, resultado)
+        final = None
+        for indice, (funcion, orden, izquierda, derecha, es_raiz, altura) in enumerate(programa):
+            if izquierda.__class__ is Referencia:
+                if alturas[izquierda] == 0:
+                    continue
+                izquierda = valores[izquierda]
+            if derecha.__class__ is Referencia:
+                if alturas[derecha] == 0:
+                    continue
+                derecha = valores[derecha]
+            
+            # AgenteES sólo despacha tareas con operandos int o float
+            if not (isinstance(izquierda, (int, float)) and isinstance(derecha, (int, float))):
+                continue
+            
+            try:
+                valor = funcion(izquierda, derecha)
+            except Exception as error:
+                valor = f"ERROR: {error}"
+                es_raiz = True
+            else:
+                valores[indice] = valor
+                alturas[indice] = altura
+            
+            # Los eventos llegan en orden de creación: a igual altura y agente gana el último
+            if es_raiz and (final is None or altura < final[0] or
+                            (altura == final[0] and orden >= final[1])):
+                final = (altura, orden, valor)
+        
+        if final is None or 2 * final[0] > max_pasos:
+            return None
+        return final[2]
+    
+    def evaluar_columnas(self, variables, max_pasos=100):
+        """Evaluar el grafo con las variables ligadas a arreglos de numpy, columna a columna.
+        
+        Cada elemento da lo mismo que evaluar() con las variables ligadas a ese
+        elemento como float: por elemento se sigue qué evento termina la
+        evaluación (altura y orden del agente), sin mensajes. Suma, resta,
+        producto y división se aplican a la columna entera; la potencia usa la
+        de Python (np.power redondea distinto) y sólo los casos especiales
+        (base 0, resultado complejo, posible desbordamiento, valores no
+        finitos) se resuelven uno a uno.
+        """
+        self.verificar_variables(variables)
+        columnas = {nombre: np.asarray(variables[nombre], dtype=np.float64) for nombre in self.variables}
+        forma_salida = np.broadcast_shapes(*(columna.shape for columna in columnas.values()))
+        # Con forma () numpy devuelve escalares: se trabaja con un elemento
+        forma = forma_salida or (1,)
+        
+        raiz = self.tareas[self.id_raiz]
+        if raiz["operacion"] == "constante":
+            valor = raiz["izquierda"]
+            valor = columnas[valor.nombre] if valor.__class__ is Variable else valor
+            tipo = object if isinstance(valor, int) else np.float64
+            return ResultadoColumnas(np.array(np.broadcast_to(valor, forma_salida), dtype=tipo),
+                                     np.full(forma_salida, None, dtype=object),
+                                     np.ones(forma_salida, dtype=bool))
+        if self.programa is None:
+            self.programa = self.compilar_programa()
+        
+        # Evento que termina la evaluación de cada elemento: altura, orden del
+        # agente, valor y mensaje de error (posición en `mensajes`, -1 si es el resultado)
+        fin_altura = np.full(forma, np.inf)
+        fin_orden = np.zeros(forma, dtype=np.int64)
+        fin_valor = np.full(forma, np.nan)
+        fin_error = np.full(forma, -1, dtype=np.int64)
+        mensajes = []
+        # Resultados de la raíz que no son float (enteros de tareas entre constantes, complejos)
+        otros = {}
+        todos = np.ones(forma, dtype=bool)
+        
+        def registrar(mascara, altura, orden, valor=np.nan, mensaje=None):
+            gana = mascara & ((altura < fin_altura) | ((altura == fin_altura) & (orden >= fin_orden)))
+            fin_altura[gana] = altura
+            fin_orden[gana] = orden
+            if mensaje is None:
+                fin_error[gana] = -1
+                fin_valor[gana] = np.broadcast_to(valor, forma)[gana]
+            else:
+                if mensaje not in mensajes:
+                    mensajes.append(mensaje)
+                fin_error[gana] = mensajes.index(mensaje)
+            for posicion in list(otros):
+                if gana[posicion]:
+                    del otros[posicion]
+            return gana
+        
+        # Valor, elementos válidos y altura por posición en el programa
+        valores = [None] * len(self.programa)
+        validos = [None] * len(self.programa)
+        alturas = [0] * len(self.programa)
+        for indice, (funcion, orden, izquierda, derecha, es_raiz, altura) in enumerate(self.programa):
+            valido = todos
+            operandos = []
+            for operando in (izquierda, derecha):
+                if operando.__class__ is Referencia:
+                    if alturas[operando] == 0:
+                        break
+                    valido = valido & validos[operando]
+                    operando = valores[operando]
+                elif operando.__class__ is Variable:
+                    operando = columnas[operando.nombre]
+                operandos.append(operando)
+            if len(operandos) < 2:
+                continue
+            izquierda, derecha = operandos
+            
+            # AgenteES sólo despacha tareas con operandos int o float
+            escalares = [o for o in operandos if not isinstance(o, np.ndarray)]
+            if not all(isinstance(o, (int, float)) for o in escalares):
+                continue
+            
+            if len(escalares) == 2:
+                # Tarea entre constantes: igual para todos los elementos
+                try:
+                    valor = funcion(izquierda, derecha)
+                except Exception as error:
+                    registrar(todos, altura, orden, mensaje=f"ERROR: {error}")
+                    continue
+                valores[indice] = valor
+                validos[indice] = todos if isinstance(valor, (int, float)) else ~todos
+                alturas[indice] = altura
+                if es_raiz:
+                    if isinstance(valor, float):
+                        registrar(todos, altura, orden, valor=valor)
+                    else:
+                        registrar(todos, altura, orden)
+                        otros.update(dict.fromkeys(np.ndindex(forma), valor))
+                continue
+            
+            # Un entero que no cabe en float falla al operar con la columna
+            try:
+                a, b = [float(o) if o.__class__ is int else o for o in operandos]
+            except OverflowError as error:
+                if funcion is dividir and isinstance(derecha, np.ndarray):
+                    cero = valido & (derecha == 0)
+                    registrar(cero, altura, orden, mensaje=f"ERROR: {MENSAJE_DIVISION_CERO}")
+                    valido = valido & ~cero
+                registrar(valido, altura, orden, mensaje=f"ERROR: {error}")
+                continue
+            
+            with np.errstate(all="ignore"):
+                if funcion is dividir:
+                    cero = valido & (b == 0)
+                    registrar(cero, altura, orden, mensaje=f"ERROR: {MENSAJE_DIVISION_CERO}")
+                    valido = valido & ~cero
+                    resultado = np.divide(a, b)
+                elif funcion is operator.pow:
+                    resultado, valido, raros = self._potencia_columnas(a, b, valido, forma, registrar,
+                                                                       altura, orden)
+                    if es_raiz:
+                        for posicion, valor in raros.items():
+                            mascara = np.zeros(forma, dtype=bool)
+                            mascara[posicion] = True
+                            registrar(mascara, altura, orden)
+                            otros[posicion] = valor
+                else:
+                    resultado = FUNCIONES_VECTORIALES[ORDEN_NOMBRE[orden]](a, b)
+            
+            valores[indice] = resultado
+            validos[indice] = valido
+            alturas[indice] = altura
+            if es_raiz:
+                registrar(valido, altura, orden, valor=resultado)
+        
+        con_evento = np.isfinite(fin_altura) & (2 * fin_altura <= max_pasos)
+        con_valor = con_evento & (fin_error < 0)
+        resultado = np.where(con_valor, fin_valor, np.nan)
+        errores = np.full(forma, None, dtype=object)
+        for codigo, mensaje in enumerate(mensajes):
+            errores[con_evento & (fin_error == codigo)] = mensaje
+        otros = {posicion: valor for posicion, valor in otros.items() if con_valor[posicion]}
+        if otros:
+            resultado = resultado.astype(object)
+            for posicion, valor in otros.items():
+                resultado[posicion] = valor
+        return ResultadoColumnas(resultado.reshape(forma_salida), errores.reshape(forma_salida),
+                                 con_valor.reshape(forma_salida))
+    
+    @staticmethod
+    def _potencia_rapida(a, b, normales, forma):
+        # Elementos donde multiplicar da el mismo float que pow, sin llamarla:
+        # resultados enteros menores que 2^53 (todos los productos son exactos)
+        # y cuadrados cuyo valor exacto queda lejos de un punto medio de
+        # redondeo, donde x*x (redondeo correcto) coincide con cualquier pow con
+        # error menor que 0,55 ULP (glibc: 0,52)
+        valores = np.full(forma, np.nan)
+        enteros = normales & (b == np.floor(b)) & (b >= 0) & (b <= 52) & (a == np.floor(a))
+        if enteros.any():
+            enteros &= b * np.log2(np.abs(a)) < 52
+            exponente = np.where(enteros, b, 0).astype(np.int64)
+            base = np.where(enteros, a, 1.0)
+            producto = np.ones(forma)
+            while exponente.any():
+                producto = np.where(exponente & 1 == 1, producto * base, producto)
+                exponente >>= 1
+                base = base * base
+            valores[enteros] = producto[enteros]
+        
+        cuadrados = normales & ~enteros & (b == 2) & (np.abs(a) > 2.0 ** -480) & (np.abs(a) < 2.0 ** 480)
+        if cuadrados.any():
+            # Error exacto de x*x por el producto de Dekker (sin desbordes en este rango)
+            x = a[cuadrados]
+            cuadrado = x * x
+            alto = x * 134217729.0
+            alto -= alto - x
+            bajo = x - alto
+            error = alto * alto
+            error -= cuadrado
+            alto *= bajo
+            error += alto
+            error += alto
+            bajo *= bajo
+            error += bajo
+            lejos = (np.abs(error) <= 0.45 * np.spacing(cuadrado)) & (np.frexp(cuadrado)[0] != 0.5)
+            cuadrados[cuadrados] = lejos
+            valores[cuadrados] = cuadrado[lejos]
+        return enteros | cuadrados, valores
+    
+    @staticmethod
+    def _potencia_columnas(a, b, valido, forma, registrar, altura, orden):
+        # Potencia de Python en los elementos normales que no resuelve la vía
+        # rápida; los especiales, uno a uno
+        a = np.broadcast_to(a, forma)
+        b = np.broadcast_to(b, forma)
+        especiales = valido & (~np.isfinite(a) | ~np.isfinite(b) | (a == 0) |
+                               ((a < 0) & (b != np.floor(b))) |
+                               (np.abs(b * np.log2(np.abs(a))) > 1000))
+        normales = valido & ~especiales
+        resultado = np.full(forma, np.nan)
+        rapidos, valores = GrafoTareas._potencia_rapida(a, b, normales, forma)
+        resultado[rapidos] = valores[rapidos]
+        lentos = normales & ~rapidos
+        resultado[lentos] = POTENCIA_EXACTA(a[lentos], b[lentos]).astype(np.float64)
+        
+        valido = valido.copy()
+        # Resultados no reales: bloquean a las dependientes (la raíz sí los devuelve)
+        raros = {}
+        for posicion in zip(*np.nonzero(especiales)):
+            try:
+                valor = a[posicion].item() ** b[posicion].item()
+            except Exception as error:
+                mascara = np.zeros(forma, dtype=bool)
+                mascara[posicion] = True
+                registrar(mascara, altura, orden, mensaje=f"ERROR: {error}")
+                valido[posicion] = False
+                continue
+            if isinstance(valor, float):
+                resultado[posicion] = valor
+            else:
+                valido[posicion] = False
+                raros[posicion] = valor
+        return resultado, valido, raros
+
+# Caché LRU de grafos compilados, compartida entre modelos
+class CacheExpresiones:
+    def __init__(self, capacidad=256):
+        self.capacidad = capacidad
+        self.grafos = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+    
+    @staticmethod
+    def normalizar(expresion):
+        return "".join(expresion.split())
+    
+    def obtener(self, expresion, compilar):
+        # Una entrada por expresión y función de compilación (con o sin optimizar)
+        texto = self.normalizar(expresion)
+        clave = (texto, compilar)
+        grafo = self.grafos.get(clave)
+        if grafo is not None:
+            self.grafos.move_to_end(clave)
+            self.aciertos += 1
+            return grafo
+        
+        self.fallos += 1
+        grafo = compilar(texto)
+        self.grafos[clave] = grafo
+        if len(self.grafos) > self.capacidad:
+            self.grafos.popitem(last=False)
+            self.desalojos += 1
+        return grafo
+    
+    def limpiar(self):
+        self.grafos.clear()
+    
+    def estadisticas(self):
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "desalojos": self.desalojos,
+            "tamano": len(self.grafos),
+            "capacidad": self.capacidad
+        }
+
+CACHE_EXPRESIONES = CacheExpresiones()
+
+# Mensajes entre agentes: tuplas con nombre de campo por propiedad y __slots__
+# vacío (sin diccionario por instancia). Se construyen con una tupla, p. ej.
+# MensajeResultado((id_tarea, valor, de)), y el tipo se distingue por la clase
+def _campo(indice):
+    return property(operator.itemgetter(indice))
+
+class MensajeTarea(tuple):
+    __slots__ = ()
+    tipo = "tarea"
+    id_tarea = _campo(0)
+    operando_izq = _campo(1)
+    operando_der = _campo(2)
+    respuesta_a = _campo(3)
+
+class MensajeResultado(tuple):
+    __slots__ = ()
+    tipo = "resultado"
+    id_tarea = _campo(0)
+    valor = _campo(1)
+    de = _campo(2)
+
+class MensajeError(tuple):
+    __slots__ = ()
+    tipo = "error"
+    id_tarea = _campo(0)
+    error = _campo(1)
+    de = _campo(2)
+
+# Lotes: varias tareas para un mismo agente, o sus respuestas, en un solo mensaje.
+# Las respuestas van en el orden de las tareas; `errores` asocia la posición de
+# cada tarea fallida con su texto de error
+class MensajeLoteTareas(tuple):
+    __slots__ = ()
+    tipo = "lote_tareas"
+    ids_tarea = _campo(0)
+    operandos_izq = _campo(1)
+    operandos_der = _campo(2)
+    respuesta_a = _campo(3)
+
+class MensajeLoteResultados(tuple):
+    __slots__ = ()
+    tipo = "lote_resultados"
+    ids_tarea = _campo(0)
+    valores = _campo(1)
+    errores = _campo(2)
+    de = _campo(3)
+
+def calcular_lote(operacion, izquierdos, derechos):
+    """Valores y errores (por posición) de una operación sobre varias tareas.
+    
+    No depende del agente, así que también se ejecuta en otro proceso. Con
+    al menos TAMANO_MINIMO_LOTE tareas de una operación vectorial se usa
+    numpy; si no, o si algún entero no cabe en un float, tarea por tarea.
+    """
+    if operacion in FUNCIONES_VECTORIALES and len(izquierdos) >= TAMANO_MINIMO_LOTE:
+        calculado = calcular_lote_vectorial(operacion, izquierdos, derechos)
+        if calculado is not None:
+            return calculado
+    
+    funcion = FUNCIONES_OPERACION[operacion]
+    valores = [None] * len(izquierdos)
+    errores = {}
+    for indice, (a, b) in enumerate(zip(izquierdos, derechos)):
+        try:
+            valores[indice] = funcion(a, b)
+        except Exception as error:
+            errores[indice] = str(error)
+    return valores, errores
+
+def calcular_lote_vectorial(operacion, izquierdos, derechos):
+    """Lote con numpy, idéntico al escalar; None si algún entero no cabe en un float.
+    
+    Los enteros se operan en float64 sólo si son exactos (|x| < 2^53) y una
+    suma, resta o producto de enteros vuelve a ser int si el resultado
+    también lo es. Las tareas que no cumplen estas condiciones se calculan
+    una a una dentro del lote.
+    """
+    try:
+        a = np.array(izquierdos, dtype=np.float64)
+        b = np.array(derechos, dtype=np.float64)
+    except OverflowError:
+        return None
+    
+    funcion = FUNCIONES_OPERACION[operacion]
+    enteros_a = np.array([x.__class__ is int for x in izquierdos])
+    enteros_b = np.array([x.__class__ is int for x in derechos])
+    with np.errstate(all="ignore"):
+        resultados = FUNCIONES_VECTORIALES[operacion](a, b)
+    exactas = ((~enteros_a | (np.abs(a) < LIMITE_ENTERO_EXACTO)) &
+               (~enteros_b | (np.abs(b) < LIMITE_ENTERO_EXACTO)))
+    
+    errores = {}
+    if operacion == "division":
+        enteros = None  # int / int da float
+        errores = dict.fromkeys(np.flatnonzero(exactas & (b == 0)).tolist(), MENSAJE_DIVISION_CERO)
+    else:
+        enteros = enteros_a & enteros_b
+        exactas &= ~enteros | (np.abs(resultados) < LIMITE_ENTERO_EXACTO)
+    
+    if enteros is None or not enteros.any():
+        valores = resultados.tolist()
+    elif enteros.all() and exactas.all():
+        valores = resultados.astype(np.int64).tolist()
+    else:
+        valores = [int(v) if e else v for v, e in zip(resultados.tolist(), (enteros & exactas).tolist())]
+    
+    # Las tareas no exactas se calculan como en la vía escalar, en su posición
+    for indice in np.flatnonzero(~exactas).tolist():
+        try:
+            valores[indice] = funcion(izquierdos[indice], derechos[indice])
+        except Exception as error:
+            errores[indice] = str(error)
+    return valores, errores
+
+def repartir_carga(n_tareas, cargas):
+    """Tareas para cada trabajador de modo que las colas queden lo más parejas posible.
+    
+    Se llenan primero las colas más cortas hasta un nivel común; el resto de
+    la división va a los menos cargados.
+    """
+    orden = sorted(range(len(cargas)), key=cargas.__getitem__)
+    acumulado = activos = 0
+    for indice in orden:
+        # El nivel con los trabajadores ya elegidos no llega a la cola de éste
+        if activos and n_tareas + acumulado < cargas[indice] * activos:
+            break
+        acumulado += cargas[indice]
+        activos += 1
+    nivel, resto = divmod(n_tareas + acumulado, activos)
+    tramos = [0] * len(cargas)
+    for posicion, indice in enumerate(orden[:activos]):
+        tramos[indice] = nivel - cargas[indice] + (posicion < resto)
+    return tramos
 
 # Agentes de Operación
+def elementos_mensaje(mensaje):
+    """Tareas o resultados que lleva un mensaje (los lotes llevan varios)"""
+    clase = mensaje.__class__
+    if clase is MensajeLoteTareas or clase is MensajeLoteResultados:
+        return len(mensaje[0])
+    return 1
+
+class MetricasModelo:
+    """Contadores y tiempos de un ModeloCalculadora creado con metricas=True.
+    
+    Por agente: pasos, mensajes y elementos (tareas o resultados) atendidos,
+    profundidad máxima de la bandeja al empezar un paso y tiempo en su step.
+    Por modelo: tiempos de compilación, entrega de mensajes, envío a los
+    procesos y del planificador.
+    """
+    
+    def __init__(self, ids_agentes):
+        self.ids_agentes = list(ids_agentes)
+        self.reiniciar()
+    
+    def reiniciar(self):
+        self.pasos = 0
+        self.expresiones = 0
+        self.mensajes_entregados = 0
+        self.segundos = {"compilacion": 0.0, "entrega": 0.0, "adelantar": 0.0, "planificador": 0.0}
+        self.agentes = {id_agente: {"pasos": 0, "mensajes": 0, "elementos": 0, "cola_maxima": 0,
+                                    "segundos": 0.0}
+                        for id_agente in self.ids_agentes}
+    
+    def medir(self, id_agente, step):
+        """step del agente que además acumula su tiempo y sus pasos"""
+        def step_medido():
+            inicio = time.perf_counter()
+            step()
+            metricas = self.agentes[id_agente]
+            metricas["segundos"] += time.perf_counter() - inicio
+            metricas["pasos"] += 1
+        return step_medido
+    
+    def bandeja(self, id_agente, bandeja):
+        # Lo que el agente atenderá en este paso: su bandeja tras la entrega
+        metricas = self.agentes[id_agente]
+        elementos = sum(map(elementos_mensaje, bandeja))
+        metricas["mensajes"] += len(bandeja)
+        metricas["elementos"] += elementos
+        metricas["cola_maxima"] = max(metricas["cola_maxima"], elementos)
+    
+    def estadisticas(self):
+        agentes = {}
+        for id_agente, metricas in self.agentes.items():
+            pasos = metricas["pasos"] or 1
+            agentes[id_agente] = {**metricas, "segundos_por_paso": metricas["segundos"] / pasos}
+        return {
+            "pasos": self.pasos,
+            "expresiones": self.expresiones,
+            "mensajes_entregados": self.mensajes_entregados,
+            "segundos": dict(self.segundos),
+            "agentes": agentes,
+        }
+
 class AgenteOperacion(Agent):
-    def __init__(self, unique_id, model, operacion):
+    def __init__(self, unique_id, model, operacion, ejecutor=None):
         super().__init__(unique_id, model)
         self.operacion = operacion
-        self.bandeja_entrada = []
+        # La función se resuelve una vez: misma tabla que la evaluación directa,
+        # para que ambas den igual resultado y error
+        self.funcion = FUNCIONES_OPERACION[operacion]
+        self.funcion_vectorial = FUNCIONES_VECTORIALES.get(operacion)
+        self.bandeja_entrada = deque()
+        # Proceso propio (opcional) donde se calculan los lotes grandes
+        self.ejecutor = ejecutor
+        self.en_proceso = None
+        # Tareas enviadas por el agente E/S y aún sin responder
+        self.en_cola = 0
+    
+    def adelantar(self):
+        """Mandar las tareas de la bandeja al proceso del agente antes de que avance el modelo.
         
+        Así los lotes de todos los agentes se calculan en paralelo; cada
+        agente responde en su paso, en el orden habitual.
+        """
+        pendientes = sum(len(m.ids_tarea) if m.__class__ is MensajeLoteTareas else 1
+                         for m in self.bandeja_entrada)
+        if pendientes < TAMANO_MINIMO_PROCESO:
+            return
+        ids, izquierdos, derechos, destinos = self.tomar_tareas()
+        self.en_proceso = (ids, destinos,
+                           self.ejecutor.submit(calcular_lote, self.operacion, izquierdos, derechos))
+    
     def step(self):
-        while self.bandeja_entrada:
-            mensaje = self.bandeja_entrada.pop(0)
-            if mensaje["tipo"] == "tarea":
-                self.procesar_tarea(mensaje)
+        if self.en_proceso is not None:
+            ids, destinos, futuro = self.en_proceso
+            self.en_proceso = None
+            valores, errores = futuro.result()
+            self.responder_lote(ids, valores, errores, destinos)
+            self.en_cola -= len(ids)
+        
+        ids, izquierdos, derechos, destinos = self.tomar_tareas()
+        if self.funcion_vectorial is not None and len(ids) >= TAMANO_MINIMO_LOTE:
+            self.procesar_lote(ids, izquierdos, derechos, destinos)
+        else:
+            for tarea in zip(ids, izquierdos, derechos, destinos):
+                self.procesar_tarea(tarea)
+        self.en_cola -= len(ids)
+    
+    def tomar_tareas(self):
+        # Se vacía la bandeja completa: tareas sueltas y lotes, en orden de llegada
+        ids, izquierdos, derechos, destinos = [], [], [], []
+        for mensaje in self.bandeja_entrada:
+            if mensaje.__class__ is MensajeLoteTareas:
+                ids.extend(mensaje.ids_tarea)
+                izquierdos.extend(mensaje.operandos_izq)
+                derechos.extend(mensaje.operandos_der)
+                destinos.extend(itertools.repeat(mensaje.respuesta_a, len(mensaje.ids_tarea)))
+            elif mensaje.__class__ is MensajeTarea:
+                ids.append(mensaje.id_tarea)
+                izquierdos.append(mensaje.operando_izq)
+                derechos.append(mensaje.operando_der)
+                destinos.append(mensaje.respuesta_a)
+        self.bandeja_entrada.clear()
+        return ids, izquierdos, derechos, destinos
     
     def procesar_tarea(self, mensaje):
-        a = mensaje["operando_izq"]
-        b = mensaje["operando_der"]
-        id_tarea = mensaje["id_tarea"]
-        respuesta_a = mensaje["respuesta_a"]
-        
+        id_tarea, a, b, respuesta_a = mensaje
         try:
-            if self.operacion == "suma":
-                resultado = a + b
-            elif self.operacion == "resta":
-                resultado = a - b
-            elif self.operacion == "multiplicacion":
-                resultado = a * b
-            elif self.operacion == "division":
-                if b == 0:
-                    raise ZeroDivisionError("División por cero")
-                resultado = a / b
-            elif self.operacion == "potencia":
-                resultado = a ** b
-            
-            # Enviar resultado
-            mensaje_respuesta = {
-                "tipo": "resultado",
-                "id_tarea": id_tarea,
-                "valor": resultado,
-                "de": self.unique_id
-            }
-            self.model.enviar_mensaje(mensaje_respuesta, respuesta_a)
-            
+            resultado = self.funcion(a, b)
         except Exception as error:
-            mensaje_error = {
-                "tipo": "error",
-                "id_tarea": id_tarea,
-                "error": str(error),
-                "de": self.unique_id
-            }
-            self.model.enviar_mensaje(mensaje_error, respuesta_a)
+            respuesta = MensajeError((id_tarea, str(error), self.unique_id))
+        else:
+            respuesta = MensajeResultado((id_tarea, resultado, self.unique_id))
+        self.model.enviar_mensaje(respuesta, respuesta_a)
+    
+    def procesar_lote(self, ids, izquierdos, derechos, destinos):
+        """Aplicar la operación a todas las tareas con numpy y responder con un lote por destino"""
+        valores, errores = calcular_lote(self.operacion, izquierdos, derechos)
+        self.responder_lote(ids, valores, errores, destinos)
+    
+    def responder_lote(self, ids, valores, errores, destinos):
+        # Normalmente todas las tareas vienen del agente E/S: un solo lote de respuestas
+        primero = destinos[0]
+        if destinos.count(primero) == len(destinos):
+            self.model.enviar_mensaje(MensajeLoteResultados((ids, valores, errores, self.unique_id)), primero)
+            return
+        for destino in dict.fromkeys(destinos):
+            posiciones = [i for i, d in enumerate(destinos) if d == destino]
+            lote = MensajeLoteResultados(([ids[i] for i in posiciones], [valores[i] for i in posiciones],
+                                          {j: errores[i] for j, i in enumerate(posiciones) if i in errores},
+                                          self.unique_id))
+            self.model.enviar_mensaje(lote, destino)
 
 # Agente de Entrada/Salida
+# Estado de una expresión en curso dentro del agente E/S. El grafo compilado se
+# comparte sin copiarlo: sólo se llevan los valores y operandos faltantes propios
+class EvaluacionExpresion:
+    def __init__(self, id_evaluacion, expresion, grafo, variables=None):
+        self.id = id_evaluacion
+        self.expresion = expresion
+        self.grafo = grafo
+        self.variables = variables
+        self.id_tarea_raiz = grafo.id_raiz
+        self.faltantes = dict(grafo.faltantes)
+        self.valores = {}
+        # Tareas listas para enviar al terminar el paso del agente E/S,
+        # como (posición, id, operando izquierdo, operando derecho)
+        self.listas = []
+        self.finalizado = False
+        self.resultado_final = None
+        # Pasos que tardaría en terminar la evaluación sin optimizar
+        self.pasos = 0
+    
+    def resultado_en(self, max_pasos):
+        """Resultado si la evaluación sin optimizar termina en max_pasos pasos (si no, None)"""
+        return self.resultado_final if self.finalizado and self.pasos <= max_pasos else None
+    
+    def operando(self, operando):
+        if isinstance(operando, str) and operando in self.grafo.tareas:
+            return self.valores.get(operando)
+        if operando.__class__ is Variable:
+            return self.variables[operando.nombre]
+        return operando
+
 class AgenteES(Agent):
     def __init__(self, unique_id, model):
         super().__init__(unique_id, model)
-        self.bandeja_entrada = []
-        self.tareas = {}
-        self.tareas_pendientes = set()
-        self.dependencias = {}
-        self.id_tarea_raiz = None
-        self.finalizado = False
-        self.resultado_final = None
-        
-    def enviar_expresion(self, expresion):
-        # Reiniciar estado
-        self.tareas.clear()
-        self.tareas_pendientes.clear()
-        self.dependencias.clear()
-        self.finalizado = False
-        self.resultado_final = None
-        
-        # Parsear expresión
-        tareas, id_raiz = self.parsear_expresion(expresion)
-        self.tareas = tareas
-        self.id_tarea_raiz = id_raiz
-        self.tareas_pendientes = set(tareas.keys())
+        self.bandeja_entrada = deque()
+        # Manejador de cada tipo de mensaje recibido
+        self.manejadores = {
+            MensajeResultado: self.manejar_resultado,
+            MensajeError: self.manejar_error,
+            MensajeLoteResultados: self.manejar_lote
+        }
+        # Expresiones en curso por id; los mensajes llevan (id_evaluacion, id_tarea)
+        # para que las tareas de varias expresiones compartan cada paso
+        self.evaluaciones = {}
+        self.terminadas = {}
+        self.por_retirar = []
+        self.con_listas = []
+        self.contador_evaluaciones = itertools.count()
+        self.evaluacion_actual = None
+    
+    @property
+    def finalizado(self):
+        return self.evaluacion_actual is not None and self.evaluacion_actual.finalizado
+    
+    @property
+    def resultado_final(self):
+        return self.evaluacion_actual.resultado_final if self.evaluacion_actual else None
         
-        # Establecer dependencias
-        for id_tarea, tarea in tareas.items():
-            for operando in [tarea["izquierda"], tarea["derecha"]]:
-                if isinstance(operando, str) and operando in self.tareas:
-                    self.dependencias.setdefault(operando, []).append(id_tarea)
+    def enviar_expresion(self, expresion, variables=None):
+        # Reiniciar estado: una sola expresión en curso
+        self.evaluaciones.clear()
+        self.terminadas.clear()
+        self.por_retirar.clear()
+        self.con_listas.clear()
+        self.evaluacion_actual = None
+        id_evaluacion = self.agregar_expresion(expresion, variables)
+        self.evaluacion_actual = self.evaluaciones.get(id_evaluacion) or self.terminadas[id_evaluacion]
+    
+    def agregar_expresion(self, expresion, variables=None):
+        """Poner una expresión en curso junto a las demás y devolver su id"""
+        # Parsear expresión (o reutilizar el grafo compilado)
+        grafo = self.parsear_expresion(expresion)
+        grafo.verificar_variables(variables)
+        evaluacion = EvaluacionExpresion(next(self.contador_evaluaciones), expresion, grafo, variables)
+        self.evaluaciones[evaluacion.id] = evaluacion
         
-        # Enviar tareas listas
+        # Encolar las tareas sin dependencias y enviarlas
+        for id_tarea in grafo.iniciales:
+            constante = self.encolar(evaluacion, id_tarea)
+            if constante is not None:
+                self.procesar_resultado(evaluacion, *constante)
         self.enviar_tareas_listas()
+        self.retirar_terminadas()
+        return evaluacion.id
+    
+    def abandonar(self, id_evaluacion):
+        """Dejar de seguir una expresión; sus mensajes pendientes se ignoran"""
+        self.evaluaciones.pop(id_evaluacion, None)
+        self.terminadas.pop(id_evaluacion, None)
+    
+    def retirar_terminadas(self):
+        # Al terminar el paso en que finaliza, la expresión deja de aceptar mensajes
+        # (como el bucle de ejecutar_expresion, que ya no vuelve a avanzar el modelo)
+        for evaluacion in self.por_retirar:
+            if self.evaluaciones.pop(evaluacion.id, None) is not None:
+                self.terminadas[evaluacion.id] = evaluacion
+        self.por_retirar.clear()
     
     def step(self):
-        while self.bandeja_entrada:
-            mensaje = self.bandeja_entrada.pop(0)
+        bandeja = self.bandeja_entrada
+        manejadores = self.manejadores
+        while bandeja:
+            mensaje = bandeja.popleft()
+            manejador = manejadores.get(mensaje.__class__)
+            if manejador is not None:
+                manejador(mensaje)
+        self.enviar_tareas_listas()
+        self.retirar_terminadas()
+    
+    def manejar_resultado(self, mensaje):
+        id_evaluacion, id_tarea = mensaje.id_tarea
+        evaluacion = self.evaluaciones.get(id_evaluacion)
+        if evaluacion is not None:
+            self.procesar_resultado(evaluacion, id_tarea, mensaje.valor)
+    
+    def manejar_error(self, mensaje):
+        evaluacion = self.evaluaciones.get(mensaje.id_tarea[0])
+        if evaluacion is not None:
+            self.procesar_error(evaluacion, mensaje.id_tarea[1], mensaje.error)
+    
+    def manejar_lote(self, mensaje):
+        ids, valores, errores, _ = mensaje
+        evaluaciones = self.evaluaciones
+        for indice, (id_evaluacion, id_tarea) in enumerate(ids):
+            evaluacion = evaluaciones.get(id_evaluacion)
+            if evaluacion is None:
+                continue
+            if errores and indice in errores:
+                self.procesar_error(evaluacion, id_tarea, errores[indice])
+            else:
+                self.procesar_resultado(evaluacion, id_tarea, valores[indice])
+    
+    def procesar_error(self, evaluacion, id_tarea, error):
+        evaluacion.resultado_final = f"ERROR: {error}"
+        evaluacion.pasos = 2 * evaluacion.grafo.alturas[id_tarea]
+        evaluacion.finalizado = True
+        self.por_retirar.append(evaluacion)
+        if self.model.verboso:
+            print(evaluacion.resultado_final)
+    
+    def procesar_resultado(self, evaluacion, id_tarea, valor):
+        # Resolución iterativa: las tareas constantes se resuelven aquí mismo
+        # en lugar de volver a llamar a esta función
+        resueltas = [(id_tarea, valor)]
+        while resueltas:
+            id_tarea, valor = resueltas.pop()
+            evaluacion.valores[id_tarea] = valor
             
-            if mensaje["tipo"] == "resultado":
-                self.procesar_resultado(mensaje["id_tarea"], mensaje["valor"])
-            elif mensaje["tipo"] == "error":
-                self.resultado_final = f"ERROR: {mensaje['error']}"
-                self.finalizado = True
-                print(self.resultado_final)
-    
-    def procesar_resultado(self, id_tarea, valor):
-        # Actualizar tareas dependientes
-        for id_dependiente in self.dependencias.get(id_tarea, []):
-            tarea = self.tareas[id_dependiente]
-            if tarea["izquierda"] == id_tarea:
-                tarea["izquierda"] = valor
-            if tarea["derecha"] == id_tarea:
-                tarea["derecha"] = valor
-        
-        # Verificar si es el resultado final
-        if id_tarea == self.id_tarea_raiz:
-            self.resultado_final = valor
-            self.finalizado = True
-            print(f"Resultado: {valor}")
-            return
+            # Verificar si es el resultado final
+            if id_tarea == evaluacion.id_tarea_raiz:
+                evaluacion.resultado_final = valor
+                evaluacion.pasos = 2 * evaluacion.grafo.alturas[id_tarea]
+                evaluacion.finalizado = True
+                self.por_retirar.append(evaluacion)
+                if self.model.verboso:
+                    print(f"Resultado: {valor}")
+                continue
+            
+            # Sólo se encolan las dependientes a las que no les falta otro operando
+            for id_dependiente in evaluacion.grafo.dependencias.get(id_tarea, ()):
+                evaluacion.faltantes[id_dependiente] -= 1
+                if evaluacion.faltantes[id_dependiente] == 0:
+                    constante = self.encolar(evaluacion, id_dependiente)
+                    if constante is not None:
+                        resueltas.append(constante)
+    
+    def encolar(self, evaluacion, id_tarea):
+        """Poner en la cola una tarea sin operandos pendientes.
         
-        # Marcar tarea como completada
-        self.tareas_pendientes.discard(id_tarea)
-        if id_tarea in self.dependencias:
-            del self.dependencias[id_tarea]
+        Las tareas constantes no se envían: se devuelve (id, valor) para
+        resolverlas en el agente E/S.
+        """
+        tarea = evaluacion.grafo.tareas[id_tarea]
+        if tarea["operacion"] == "constante":
+            return id_tarea, evaluacion.operando(tarea["izquierda"])
         
-        # Enviar nuevas tareas listas
-        self.enviar_tareas_listas()
+        # Sólo se envían tareas con operandos int o float
+        izquierda = evaluacion.operando(tarea["izquierda"])
+        derecha = evaluacion.operando(tarea["derecha"])
+        if isinstance(izquierda, (int, float)) and isinstance(derecha, (int, float)):
+            if not evaluacion.listas:
+                self.con_listas.append(evaluacion)
+            evaluacion.listas.append((evaluacion.grafo.posiciones[id_tarea], id_tarea, izquierda, derecha))
+        return None
     
     def enviar_tareas_listas(self):
-        tareas_listas = []
-        
-        for id_tarea in list(self.tareas_pendientes):
-            tarea = self.tareas[id_tarea]
+        # Un lote por operación: (ids, operandos izquierdos, operandos derechos)
+        lotes = {}
+        for evaluacion in self.con_listas:
+            listas, evaluacion.listas = evaluacion.listas, []
+            if evaluacion.finalizado:
+                continue  # Sus resultados ya no se procesarían
             
-            # Tareas constantes se resuelven automáticamente
-            if tarea["operacion"] == "constante":
-                self.procesar_resultado(id_tarea, tarea["izquierda"])
-                self.tareas_pendientes.discard(id_tarea)
+            # En orden de creación, como en la evaluación directa
+            if len(listas) > 1:
+                listas.sort()
+            for _, id_tarea, izquierda, derecha in listas:
+                nombre = OPERACIONES.get(evaluacion.grafo.tareas[id_tarea]["operacion"])
+                
+                if nombre:
+                    lote = lotes.get(nombre)
+                    if lote is None:
+                        lote = lotes[nombre] = ([], [], [])
+                    lote[0].append((evaluacion.id, id_tarea))
+                    lote[1].append(izquierda)
+                    lote[2].append(derecha)
+        self.con_listas.clear()
+        
+        for nombre, (ids, izquierdos, derechos) in lotes.items():
+            self.repartir(self.model.trabajadores[nombre], ids, izquierdos, derechos)
+    
+    def repartir(self, agentes, ids, izquierdos, derechos):
+        """Enviar las tareas de una operación a sus agentes, más a los de cola más corta.
+        
+        Cada agente recibe un tramo contiguo y los agentes avanzan en orden,
+        así que las respuestas llegan en el mismo orden que con uno solo.
+        """
+        tramos = [len(ids)] if len(agentes) == 1 else repartir_carga(len(ids), [a.en_cola for a in agentes])
+        inicio = 0
+        for agente, cantidad in zip(agentes, tramos):
+            if not cantidad:
                 continue
-            
-            # Verificar si los operandos están listos
-            if (isinstance(tarea["izquierda"], (int, float)) and 
-                isinstance(tarea["derecha"], (int, float))):
-                tareas_listas.append(id_tarea)
-        
-        # Enviar tareas a los agentes
-        for id_tarea in tareas_listas:
-            tarea = self.tareas[id_tarea]
-            id_agente = self.obtener_id_agente(tarea["operacion"])
-            
-            if id_agente:
-                mensaje = {
-                    "tipo": "tarea",
-                    "id_tarea": id_tarea,
-                    "operando_izq": tarea["izquierda"],
-                    "operando_der": tarea["derecha"],
-                    "respuesta_a": self.unique_id
-                }
-                self.model.enviar_mensaje(mensaje, id_agente)
+            fin = inicio + cantidad
+            if cantidad == 1:
+                mensaje = MensajeTarea((ids[inicio], izquierdos[inicio], derechos[inicio], self.unique_id))
+            elif cantidad == len(ids):
+                mensaje = MensajeLoteTareas((ids, izquierdos, derechos, self.unique_id))
+            else:
+                mensaje = MensajeLoteTareas((ids[inicio:fin], izquierdos[inicio:fin], derechos[inicio:fin],
+                                             self.unique_id))
+            agente.en_cola += cantidad
+            self.model.enviar_mensaje(mensaje, agente.unique_id)
+            inicio = fin
     
     def obtener_id_agente(self, operacion):
-        mapeo = {
-            "+": "agente_suma",
-            "-": "agente_resta", 
-            "*": "agente_multiplicacion",
-            "/": "agente_division",
-            "^": "agente_potencia"
-        }
-        return mapeo.get(operacion)
+        # Primer agente de la operación (con un solo trabajador, el único)
+        nombre = OPERACIONES.get(operacion)
+        return self.model.trabajadores[nombre][0].unique_id if nombre else None
     
     def recibir_mensaje(self, mensaje):
         self.bandeja_entrada.append(mensaje)
     
     def parsear_expresion(self, expresion):
-        tokens = self.tokenizar(expresion)
-        rpn = self.convertir_rpn(tokens)
-        return self.construir_tareas(rpn)
+        metricas = self.model.metricas
+        if metricas is None:
+            return obtener_grafo(expresion, self.model.cache_expresiones, self.model.optimizar)
+        inicio = time.perf_counter()
+        grafo = obtener_grafo(expresion, self.model.cache_expresiones, self.model.optimizar)
+        metricas.segundos["compilacion"] += time.perf_counter() - inicio
+        metricas.expresiones += 1
+        return grafo
     
-    def tokenizar(self, expresion):
+    @staticmethod
+    def tokenizar(expresion):
         expresion_limpia = expresion.replace(" ", "")
-        return re.findall(r'(\d+\.?\d*|[+\-*/^()])', expresion_limpia)
+        return PATRON_TOKEN.findall(expresion_limpia)
     
-    def convertir_rpn(self, tokens):
+    @staticmethod
+    def convertir_rpn(tokens):
         salida = []
         pila = []
         precedencia = {'+': 1, '-': 1, '*': 2, '/': 2, '^': 3}
         
         for token in tokens:
-            if re.match(r'\d+\.?\d*', token):
+            if PATRON_NUMERO.match(token) or PATRON_VARIABLE.match(token):
                 salida.append(token)
             elif token in precedencia:
                 while (pila and pila[-1] in precedencia and 
@@ -203,18 +1074,22 @@ class AgenteES(Agent):
         
         return salida
     
-    def construir_tareas(self, rpn):
+    @staticmethod
+    def construir_tareas(rpn):
         pila = []
         tareas = {}
+        contador = itertools.count()
         
         for token in rpn:
-            if re.match(r'\d+\.?\d*', token):
+            if PATRON_NUMERO.match(token):
                 valor = float(token) if '.' in token else int(token)
                 pila.append(valor)
+            elif PATRON_VARIABLE.match(token):
+                pila.append(Variable(token))
             else:
                 derecha = pila.pop()
                 izquierda = pila.pop()
-                id_tarea = f"tarea_{uuid.uuid4().hex[:8]}"
+                id_tarea = f"tarea_{next(contador)}"
                 
                 tareas[id_tarea] = {
                     "operacion": token,
@@ -223,9 +1098,9 @@ class AgenteES(Agent):
                 }
                 pila.append(id_tarea)
         
-        # Manejar caso de expresión simple (un solo número)
-        if isinstance(pila[0], (int, float)):
-            id_tarea = f"constante_{uuid.uuid4().hex[:6]}"
+        # Manejar caso de expresión simple (un solo número o variable)
+        if isinstance(pila[0], (int, float, Variable)):
+            id_tarea = "constante_0"
             tareas[id_tarea] = {
                 "operacion": "constante", 
                 "izquierda": pila[0],
@@ -234,69 +1109,337 @@ class AgenteES(Agent):
             return tareas, id_tarea
         
         return tareas, pila[0]
+    
+    @staticmethod
+    def optimizar_tareas(tareas, id_raiz):
+        """Plegar los subárboles de constantes que no marcan el ritmo del grafo.
+        
+        Devuelve (tareas, id_raiz, eliminadas). Un subárbol de constantes que
+        da un número sin error se reemplaza por su valor cuando la otra rama
+        de su tarea padre es una tarea que no se pliega (con variables o con
+        error) y de al menos la misma altura. Así ninguna tarea que queda cambia de altura y las plegadas no
+        tenían eventos: los errores y el resultado llegan en los mismos pasos
+        y en el mismo orden que sin optimizar.
+        """
+        alturas = GrafoTareas.calcular_alturas(tareas)
+        # Valor de cada tarea cuyo subárbol es sólo de constantes y no da error
+        valores = {}
+        for id_tarea, tarea in tareas.items():
+            nombre = OPERACIONES.get(tarea["operacion"])
+            izquierda = valores.get(tarea["izquierda"], tarea["izquierda"])
+            derecha = valores.get(tarea["derecha"], tarea["derecha"])
+            if nombre is None or not all(isinstance(o, (int, float)) for o in (izquierda, derecha)):
+                continue
+            # La misma función que usaría el agente
+            try:
+                valor = FUNCIONES_OPERACION[nombre](izquierda, derecha)
+            except Exception:
+                continue
+            if isinstance(valor, (int, float)):
+                valores[id_tarea] = valor
+        
+        plegadas = set()
+        for tarea in tareas.values():
+            ramas = (tarea["izquierda"], tarea["derecha"])
+            for rama, otra in (ramas, ramas[::-1]):
+                if (rama in valores and isinstance(otra, str) and otra in tareas and
+                        otra not in valores and alturas[otra] >= alturas[rama]):
+                    plegadas.add(rama)
+        if not plegadas:
+            return tareas, id_raiz, 0
+        
+        reescritas = {}
+        for id_tarea, tarea in tareas.items():
+            reescritas[id_tarea] = {
+                "operacion": tarea["operacion"],
+                "izquierda": valores[tarea["izquierda"]] if tarea["izquierda"] in plegadas else tarea["izquierda"],
+                "derecha": valores[tarea["derecha"]] if tarea["derecha"] in plegadas else tarea["derecha"],
+            }
+        # Quedan las tareas que siguen alcanzándose desde la raíz (las padres van después)
+        alcanzables = {id_raiz}
+        for id_tarea in reversed(list(reescritas)):
+            if id_tarea in alcanzables:
+                alcanzables.update(o for o in (reescritas[id_tarea]["izquierda"], reescritas[id_tarea]["derecha"])
+                                   if isinstance(o, str) and o in tareas)
+        optimizadas = {id_tarea: tarea for id_tarea, tarea in reescritas.items() if id_tarea in alcanzables}
+        return optimizadas, id_raiz, len(tareas) - len(optimizadas)
+
+def compilar_expresion(expresion, optimizar=False):
+    tokens = AgenteES.tokenizar(expresion)
+    rpn = AgenteES.convertir_rpn(tokens)
+    tareas, id_raiz = AgenteES.construir_tareas(rpn)
+    if not optimizar:
+        return GrafoTareas(tareas, id_raiz)
+    tareas, id_raiz, eliminadas = AgenteES.optimizar_tareas(tareas, id_raiz)
+    return GrafoTareas(tareas, id_raiz, eliminadas)
+
+def compilar_optimizada(expresion):
+    return compilar_expresion(expresion, optimizar=True)
+
+def obtener_grafo(expresion, cache_expresiones=CACHE_EXPRESIONES, optimizar=False):
+    compilar = compilar_optimizada if optimizar else compilar_expresion
+    if cache_expresiones is None:
+        return compilar(expresion)
+    return cache_expresiones.obtener(expresion, compilar)
 
 # Modelo Principal
 class ModeloCalculadora(Model):
-    def __init__(self):
+    def __init__(self, cache_expresiones=CACHE_EXPRESIONES, verboso=True, trabajadores=1, procesos=0,
+                 metricas=False, optimizar=False):
         super().__init__()
         self.schedule = BaseScheduler(self)
+        # Con None se compila la expresión en cada evaluación
+        self.cache_expresiones = cache_expresiones
+        # Compilar con plegado de constantes y subárboles compartidos (mismo resultado)
+        self.optimizar = optimizar
+        self.verboso = verboso
         self.agentes = {}
         self.mensajes_pendientes = []
+        # Entrega directa a la bandeja de cada destinatario
+        self.entregas = {}
         
-        # Crear agentes de operación
-        operaciones = [
-            ("agente_suma", "suma"),
-            ("agente_resta", "resta"), 
-            ("agente_multiplicacion", "multiplicacion"),
-            ("agente_division", "division"),
-            ("agente_potencia", "potencia")
-        ]
+        # Procesos para los agentes de operación: cada agente usa siempre el mismo
+        self.ejecutores = [ProcessPoolExecutor(max_workers=1) for _ in range(procesos)]
+        self.con_proceso = []
         
-        for id_agente, operacion in operaciones:
-            agente = AgenteOperacion(id_agente, self, operacion)
-            self.agentes[id_agente] = agente
-            self.schedule.add(agente)
+        # Crear agentes de operación: `trabajadores` por operación (un número o
+        # un diccionario operación -> número), agente_<operación>_<i> si hay varios
+        self.trabajadores = {}
+        for operacion in OPERACIONES.values():
+            n = trabajadores.get(operacion, 1) if isinstance(trabajadores, dict) else trabajadores
+            self.trabajadores[operacion] = []
+            for i in range(n):
+                id_agente = f"agente_{operacion}" if n == 1 else f"agente_{operacion}_{i}"
+                ejecutor = None
+                if self.ejecutores:
+                    ejecutor = self.ejecutores[len(self.con_proceso) % len(self.ejecutores)]
+                agente = AgenteOperacion(id_agente, self, operacion, ejecutor)
+                if ejecutor is not None:
+                    self.con_proceso.append(agente)
+                self.trabajadores[operacion].append(agente)
+                self.agentes[id_agente] = agente
+                self.entregas[id_agente] = agente.bandeja_entrada.append
+                self.schedule.add(agente)
         
         # Crear agente E/S
         agente_es = AgenteES("agente_es", self)
         self.agente_es = agente_es
         self.agentes["agente_es"] = agente_es
+        self.entregas["agente_es"] = agente_es.bandeja_entrada.append
         self.schedule.add(agente_es)
+        
+        # Métricas por agente (opcional): sin ellas el paso no mide nada
+        self.metricas = None
+        if metricas:
+            self.metricas = MetricasModelo(self.agentes)
+            for id_agente, agente in self.agentes.items():
+                agente.step = self.metricas.medir(id_agente, agente.step)
     
     def enviar_mensaje(self, mensaje, destinatario_id):
         self.mensajes_pendientes.append((destinatario_id, mensaje))
     
+    
     def entregar_mensajes(self):
+        entregas = self.entregas
         for destinatario_id, mensaje in self.mensajes_pendientes:
-            if destinatario_id in self.agentes:
-                agente = self.agentes[destinatario_id]
-                if isinstance(agente, AgenteES):
-                    agente.recibir_mensaje(mensaje)
-                else:
-                    agente.bandeja_entrada.append(mensaje)
+            entregar = entregas.get(destinatario_id)
+            if entregar is not None:
+                entregar(mensaje)
         
         self.mensajes_pendientes.clear()
     
     def step(self):
+        if self.metricas is not None:
+            self.step_medido()
+            return
         self.entregar_mensajes()
+        for agente in self.con_proceso:
+            agente.adelantar()
         self.schedule.step()
         self.entregar_mensajes()
+    
+    def step_medido(self):
+        """El mismo paso, registrando en self.metricas lo que hace cada agente"""
+        metricas = self.metricas
+        segundos = metricas.segundos
+        
+        inicio = time.perf_counter()
+        metricas.mensajes_entregados += len(self.mensajes_pendientes)
+        self.entregar_mensajes()
+        segundos["entrega"] += time.perf_counter() - inicio
+        
+        for id_agente, agente in self.agentes.items():
+            metricas.bandeja(id_agente, agente.bandeja_entrada)
+        inicio = time.perf_counter()
+        for agente in self.con_proceso:
+            agente.adelantar()
+        segundos["adelantar"] += time.perf_counter() - inicio
+        
+        # Cada agente mide su step (ver MetricasModelo.medir)
+        inicio = time.perf_counter()
+        self.schedule.step()
+        segundos["planificador"] += time.perf_counter() - inicio
+        
+        inicio = time.perf_counter()
+        metricas.mensajes_entregados += len(self.mensajes_pendientes)
+        self.entregar_mensajes()
+        segundos["entrega"] += time.perf_counter() - inicio
+        metricas.pasos += 1
+    
+    def cerrar(self):
+        """Terminar los procesos de los agentes de operación"""
+        for ejecutor in self.ejecutores:
+            ejecutor.shutdown()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *excepcion):
+        self.cerrar()
+    
+    def resultados_a_medida(self, expresiones, max_pasos=100, variables=None):
+        """Evaluar varias expresiones a la vez y generar (índice, resultado) a medida que terminan.
+        
+        Todas comparten los pasos del modelo, y cada una da el mismo resultado
+        que con ejecutar_expresion. Si una expresión no se puede parsear, su
+        resultado es la excepción.
+        """
+        agente_es = self.agente_es
+        indices = {}
+        for indice, expresion in enumerate(expresiones):
+            try:
+                indices[agente_es.agregar_expresion(expresion, variables)] = indice
+            except Exception as error:
+                yield indice, error
+        
+        pasos = 0
+        while True:
+            for id_evaluacion in [i for i in agente_es.terminadas if i in indices]:
+                yield indices.pop(id_evaluacion), agente_es.terminadas.pop(id_evaluacion).resultado_en(max_pasos)
+            if not indices or pasos >= max_pasos:
+                break
+            self.step()
+            pasos += 1
+        
+        # Sin resultado dentro de max_pasos
+        for id_evaluacion, indice in indices.items():
+            agente_es.abandonar(id_evaluacion)
+            yield indice, None
+    
+    def ejecutar_lote(self, expresiones, max_pasos=100, variables=None):
+        """Resultados de varias expresiones, en el orden de entrada"""
+        expresiones = list(expresiones)
+        resultados = [None] * len(expresiones)
+        for indice, resultado in self.resultados_a_medida(expresiones, max_pasos, variables):
+            resultados[indice] = resultado
+        return resultados
 
 # Función de ejecución
-def ejecutar_expresion(expresion, max_pasos=100):
+def ejecutar_expresion(expresion, max_pasos=100, modo="agentes", variables=None):
+    # modo "directo": recorrer el grafo compilado sin crear el modelo ni enviar mensajes
+    if modo == "directo":
+        return evaluar_directo(expresion, max_pasos, variables=variables)
+    
     modelo = ModeloCalculadora()
     agente_es = modelo.agente_es
-    agente_es.enviar_expresion(expresion)
+    agente_es.enviar_expresion(expresion, variables)
     
     pasos = 0
     while not agente_es.finalizado and pasos < max_pasos:
         modelo.step()
         pasos += 1
     
-    return agente_es.resultado_final
+    return agente_es.evaluacion_actual.resultado_en(max_pasos)
+
+def ejecutar_lote(expresiones, max_pasos=100, modelo=None, variables=None):
+    # Un único modelo para todo el lote (o uno persistente del llamador)
+    modelo = modelo or ModeloCalculadora(verboso=False)
+    return modelo.ejecutar_lote(expresiones, max_pasos, variables)
+
+def evaluar_directo(expresion, max_pasos=100, cache_expresiones=CACHE_EXPRESIONES, variables=None):
+    return obtener_grafo(expresion, cache_expresiones).evaluar(max_pasos, variables)
+
+def evaluar_columnas(expresion, variables, max_pasos=100, cache_expresiones=CACHE_EXPRESIONES):
+    # Compilar una vez y evaluar sobre arreglos: variables = {"x": arreglo, ...}
+    return obtener_grafo(expresion, cache_expresiones).evaluar_columnas(variables, max_pasos)
+
+def informe_optimizacion(expresion):
+    """Tareas, mensajes y pasos de una expresión con y sin la optimización al compilar.
+    
+    Los pasos son los que tarda la evaluación con agentes; la optimización
+    no cambia alturas, así que coinciden.
+    """
+    sin_optimizar = compilar_expresion(expresion, optimizar=False)
+    optimizado = compilar_expresion(expresion, optimizar=True)
+    
+    def tareas(grafo):
+        return 0 if grafo.tareas[grafo.id_raiz]["operacion"] == "constante" else len(grafo.tareas)
+    
+    # Cada tarea cuesta un mensaje de tarea y uno de resultado
+    return {
+        "expresion": expresion,
+        "tareas": tareas(sin_optimizar),
+        "tareas_optimizado": tareas(optimizado),
+        "eliminadas": optimizado.eliminadas,
+        "mensajes": 2 * tareas(sin_optimizar),
+        "mensajes_optimizado": 2 * tareas(optimizado),
+        "pasos": 2 * sin_optimizar.altura(),
+        "pasos_optimizado": 2 * optimizado.altura(),
+    }
+
+def _resultado_o_excepcion(funcion, *args):
+    # Resultado comparable entre motores: repr del valor o tipo y texto de la excepción
+    try:
+        return repr(funcion(*args))
+    except Exception as error:
+        return f"{type(error).__name__}: {error}"
+
+def comparar_motores(expresion, max_pasos=100):
+    """Evaluar con agentes y en modo directo; devuelve la discrepancia o None"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        agentes = _resultado_o_excepcion(ejecutar_expresion, expresion, max_pasos)
+    directo = _resultado_o_excepcion(evaluar_directo, expresion, max_pasos)
+    if agentes == directo:
+        return None
+    return {"expresion": expresion, "agentes": agentes, "directo": directo}
+
+# Evaluación directa que contrasta una muestra del tráfico con el modelo de agentes
+class VerificadorEquivalencia:
+    def __init__(self, fraccion=0.01, max_pasos=100, semilla=None):
+        self.fraccion = fraccion
+        self.max_pasos = max_pasos
+        self.aleatorio = random.Random(semilla)
+        self.evaluadas = 0
+        self.verificadas = 0
+        self.discrepancias = []
+    
+    def evaluar(self, expresion):
+        self.evaluadas += 1
+        if self.aleatorio.random() < self.fraccion:
+            self.verificadas += 1
+            discrepancia = comparar_motores(expresion, self.max_pasos)
+            if discrepancia is not None:
+                self.discrepancias.append(discrepancia)
+        return evaluar_directo(expresion, self.max_pasos)
+    
+    def informe(self):
+        return {
+            "evaluadas": self.evaluadas,
+            "verificadas": self.verificadas,
+            "discrepancias": self.discrepancias
+        }
+
+def verificar_equivalencia(expresiones, fraccion=1.0, max_pasos=100, semilla=None):
+    verificador = VerificadorEquivalencia(fraccion, max_pasos, semilla)
+    for expresion in expresiones:
+        try:
+            verificador.evaluar(expresion)
+        except Exception:
+            pass  # Las expresiones mal formadas también se comparan en comparar_motores
+    return verificador.informe()
 
 # Interfaz interactiva
-def interfaz_calculadora():
+def interfaz_calculadora(modo="agentes"):
     print("Calculadora Basada en Agentes - MESA")
     print("Operaciones: + - * / ^")
     print("Escribe 'salir' para terminar\n")
@@ -309,7 +1452,7 @@ def interfaz_calculadora():
             if not expresion:
                 continue
             
-            resultado = ejecutar_expresion(expresion)
+            resultado = ejecutar_expresion(expresion, modo=modo)
             if resultado:
                 print(f"= {resultado}\n")
             else:
@@ -318,5 +1461,59 @@ def interfaz_calculadora():
         except Exception as e:
             print(f"Error: {e}\n")
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculadora basada en agentes (MESA)")
+    parser.add_argument("--directo", action="store_true",
+                        help="evaluar sin el modelo de agentes (mismo resultado, menor latencia)")
+    parser.add_argument("--verificar", metavar="RUTA",
+                        help="comparar ambos motores sobre un archivo con una expresión por línea")
+    parser.add_argument("--lote", metavar="RUTA",
+                        help="evaluar en un solo modelo todas las expresiones de un archivo")
+    parser.add_argument("--optimizacion", metavar="RUTA",
+                        help="informar tareas, mensajes y pasos ahorrados en cada expresión de un archivo")
+    parser.add_argument("--fraccion", type=float, default=1.0,
+                        help="fracción de expresiones que se verifican")
+    parser.add_argument("--max-pasos", type=int, default=100)
+    parser.add_argument("--trabajadores", type=int, default=1,
+                        help="agentes por operación en el modo --lote")
+    parser.add_argument("--procesos", type=int, default=0,
+                        help="procesos entre los que se reparten los agentes de operación (--lote)")
+    parser.add_argument("--optimizar", action="store_true",
+                        help="con --lote, plegar constantes y compartir subárboles al compilar")
+    parser.add_argument("--metricas", action="store_true",
+                        help="con --lote, escribir en stderr las métricas por agente (JSON)")
+    args = parser.parse_args(argv)
+    
+    if args.lote:
+        with open(args.lote) as archivo:
+            expresiones = [linea.strip() for linea in archivo if linea.strip()]
+        with ModeloCalculadora(verboso=False, trabajadores=args.trabajadores,
+                               procesos=args.procesos, metricas=args.metricas,
+                               optimizar=args.optimizar) as modelo:
+            resultados = ejecutar_lote(expresiones, args.max_pasos, modelo)
+        if modelo.metricas is not None:
+            print(json.dumps(modelo.metricas.estadisticas()), file=sys.stderr)
+        for expresion, resultado in zip(expresiones, resultados):
+            if isinstance(resultado, Exception):
+                resultado = f"Error: {resultado}"
+            print(f"{expresion} = {resultado}")
+        return
+    
+    if args.optimizacion:
+        with open(args.optimizacion) as archivo:
+            for linea in archivo:
+                if linea.strip():
+                    print(json.dumps(informe_optimizacion(linea.strip()), ensure_ascii=False))
+        return
+    
+    if args.verificar:
+        with open(args.verificar) as archivo:
+            expresiones = [linea.strip() for linea in archivo if linea.strip()]
+        informe = verificar_equivalencia(expresiones, args.fraccion, args.max_pasos)
+        print(json.dumps(informe, ensure_ascii=False))
+        return
+    
+    interfaz_calculadora("directo" if args.directo else "agentes")
+
 if __name__ == "__main__":
-    interfaz_calculadora()
\ No newline at end of file
+    main()
\ No newline at end of file
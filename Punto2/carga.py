@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import time
+
+import numpy as np
+
+from servidor import ServidorCalculadora, servir
+
+EXPRESIONES = ["1+2*3-4/5", "(2+3)*(7-1)^2", "10/(5-5)", "2^0.5*3"]
+
+async def conexion(abrir, expresiones, n_peticiones, ventana, usar_json, latencias):
+    """Enviar n_peticiones por una conexión con hasta `ventana` sin responder"""
+    lector, escritor = await abrir()
+    enviadas = asyncio.Queue(ventana)
+
+    async def enviar():
+        for i in range(n_peticiones):
+            expresion = expresiones[i % len(expresiones)]
+            linea = json.dumps({"id": i, "expresion": expresion}) if usar_json else expresion
+            # Se bloquea con `ventana` peticiones en vuelo
+            await enviadas.put(time.perf_counter())
+            escritor.write(linea.encode() + b"\n")
+            await escritor.drain()
+
+    async def recibir():
+        for _ in range(n_peticiones):
+            if not await lector.readline():
+                raise ConnectionError("El servidor cerró la conexión")
+            latencias.append(time.perf_counter() - enviadas.get_nowait())
+
+    await asyncio.gather(enviar(), recibir())
+    escritor.close()
+    await escritor.wait_closed()
+
+async def medir(abrir, conexiones=10, peticiones=1000, ventana=16, expresiones=EXPRESIONES, usar_json=False):
+    """Peticiones por segundo y latencias (ms) de varias conexiones concurrentes"""
+    latencias = []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(conexion(abrir, expresiones, peticiones, ventana, usar_json, latencias)
+                           for _ in range(conexiones)))
+    segundos = time.perf_counter() - inicio
+    milisegundos = 1000 * np.array(latencias)
+    return {
+        "conexiones": conexiones,
+        "peticiones": len(latencias),
+        "ventana": ventana,
+        "segundos": segundos,
+        "peticiones_por_segundo": len(latencias) / segundos,
+        "p50_ms": float(np.percentile(milisegundos, 50)),
+        "p99_ms": float(np.percentile(milisegundos, 99)),
+    }
+
+async def medir_local(servidor, **opciones):
+    """Levantar el servidor en este mismo proceso (puerto libre) y medirlo"""
+    listo = asyncio.get_running_loop().create_future()
+    tarea = asyncio.create_task(servir("127.0.0.1", 0, servidor=servidor, listo=listo))
+    conexiones = await listo
+    puerto = conexiones.sockets[0].getsockname()[1]
+    try:
+        return await medir(lambda: asyncio.open_connection("127.0.0.1", puerto), **opciones)
+    finally:
+        # Esperar el cierre ordenado del servidor
+        tarea.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await tarea
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generador de carga para el servidor de la calculadora")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--unix", metavar="RUTA", help="conectarse a un socket Unix")
+    parser.add_argument("--local", action="store_true",
+                        help="levantar el servidor en este proceso en lugar de conectarse a uno")
+    parser.add_argument("--conexiones", type=int, default=10)
+    parser.add_argument("--peticiones", type=int, default=1000, help="peticiones por conexión")
+    parser.add_argument("--ventana", type=int, default=16, help="peticiones sin responder por conexión")
+    parser.add_argument("--expresiones", nargs="+", default=EXPRESIONES)
+    parser.add_argument("--json", action="store_true", help="usar el protocolo JSON")
+    args = parser.parse_args(argv)
+
+    opciones = dict(conexiones=args.conexiones, peticiones=args.peticiones, ventana=args.ventana,
+                    expresiones=args.expresiones, usar_json=args.json)
+    if args.local:
+        resultado = asyncio.run(medir_local(ServidorCalculadora(), **opciones))
+    elif args.unix:
+        resultado = asyncio.run(medir(lambda: asyncio.open_unix_connection(args.unix), **opciones))
+    else:
+        resultado = asyncio.run(medir(lambda: asyncio.open_connection(args.host, args.puerto), **opciones))
+    print(json.dumps(resultado))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import json
+import random
+import sys
+import time
+
+from calculadora import CacheExpresiones, ModeloCalculadora, compilar_expresion
+
+FORMAS = ("plana", "balanceada", "cadena")
+
+def generar_expresion(n_operadores, forma="plana", semilla=0):
+    """Expresión con n_operadores operadores generada de forma reproducible.
+
+    - plana: números y operadores + - * / alternados, sin paréntesis
+      (la precedencia da un árbol irregular)
+    - balanceada: árbol binario completo con paréntesis, de altura log2(n)
+    - cadena: ((1+2)-3)+... anidada a la izquierda, de altura n
+    """
+    rng = random.Random(semilla)
+
+    def numero():
+        return str(rng.randint(1, 9))
+
+    if forma == "plana":
+        partes = [numero()]
+        for _ in range(n_operadores):
+            partes.append(rng.choice("+-*/"))
+            partes.append(numero())
+        return "".join(partes)
+
+    if forma == "cadena":
+        partes = ["(" * n_operadores, numero()]
+        for _ in range(n_operadores):
+            partes.append(rng.choice("+-"))
+            partes.append(numero())
+            partes.append(")")
+        return "".join(partes)
+
+    if forma == "balanceada":
+        # Se combinan hojas de dos en dos, nivel a nivel, sin recursión
+        nivel = [numero() for _ in range(n_operadores + 1)]
+        while len(nivel) > 1:
+            siguiente = [f"({nivel[i]}{rng.choice('+-')}{nivel[i + 1]})"
+                         for i in range(0, len(nivel) - 1, 2)]
+            if len(nivel) % 2:
+                siguiente.append(nivel[-1])
+            nivel = siguiente
+        return nivel[0]
+
+    raise ValueError(f"Forma desconocida: {forma}")
+
+def medir(n_operadores, forma="plana", semilla=0):
+    """Tiempo de compilar y de evaluar con agentes una expresión generada"""
+    expresion = generar_expresion(n_operadores, forma, semilla)
+
+    # La compilación se mide aparte: el modelo toma el grafo ya compilado de la caché
+    cache = CacheExpresiones(capacidad=1)
+    inicio = time.perf_counter()
+    grafo = cache.obtener(expresion, compilar_expresion)
+    segundos_compilacion = time.perf_counter() - inicio
+    max_pasos = 2 * grafo.altura()
+
+    modelo = ModeloCalculadora(cache_expresiones=cache, verboso=False)
+    inicio = time.perf_counter()
+    resultado = modelo.ejecutar_lote([expresion], max_pasos)[0]
+    segundos_agentes = time.perf_counter() - inicio
+
+    esperado = grafo.evaluar(max_pasos)
+    return {
+        "forma": forma,
+        "n_operadores": n_operadores,
+        "altura": max_pasos // 2,
+        "segundos_compilacion": segundos_compilacion,
+        "segundos_agentes": segundos_agentes,
+        "ns_por_operador": 1e9 * segundos_agentes / n_operadores,
+        "coincide_directo": repr(resultado) == repr(esperado),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de estrés del agente E/S con expresiones grandes")
+    parser.add_argument("--exponentes", type=int, nargs="+", default=[3, 4, 5])
+    parser.add_argument("--formas", nargs="+", choices=FORMAS, default=list(FORMAS))
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--tolerancia", type=float, default=3.0,
+                        help="crecimiento máximo del costo por operador frente al tamaño menor")
+    args = parser.parse_args(argv)
+
+    fallas = []
+    for forma in args.formas:
+        resultados = [medir(10 ** exponente, forma, args.semilla) for exponente in args.exponentes]
+        for resultado in resultados:
+            print(json.dumps(resultado))
+            if not resultado["coincide_directo"]:
+                fallas.append(f"{forma} n={resultado['n_operadores']}: difiere de la evaluación directa")
+
+        # Tiempo lineal: el costo por operador no debe crecer con el tamaño
+        base = resultados[0]["ns_por_operador"]
+        for resultado in resultados[1:]:
+            if resultado["ns_por_operador"] > base * args.tolerancia:
+                fallas.append(f"{forma} n={resultado['n_operadores']}: "
+                              f"{resultado['ns_por_operador']:.0f} ns/operador frente a {base:.0f}")
+
+    for falla in fallas:
+        print(f"FALLA {falla}", file=sys.stderr)
+    if fallas:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import argparse
+import asyncio
+import heapq
+import json
+
+from calculadora import ModeloCalculadora
+
+# Respuesta de texto cuando no hay resultado, como en interfaz_calculadora
+SIN_RESULTADO = "Error: No se pudo calcular la expresión"
+
+def valor_json(valor):
+    """Valor serializable: los complejos viajan como texto"""
+    return str(valor) if isinstance(valor, complex) else valor
+
+class PeticionInvalida(ValueError):
+    """Petición JSON rechazada; conserva su id si se pudo leer"""
+    def __init__(self, mensaje, id_peticion=None):
+        super().__init__(mensaje)
+        self.id_peticion = id_peticion
+
+class ServidorCalculadora:
+    """Evaluación de expresiones para muchos clientes sobre un único modelo de agentes.
+
+    Todas las conexiones comparten un ModeloCalculadora que avanza en una
+    tarea del bucle de eventos (el motor): en cada paso admite las
+    peticiones encoladas y responde las evaluaciones terminadas. Cada
+    petición tiene su presupuesto de pasos (max_pasos): el resultado es el
+    mismo que con ejecutar_expresion(expresion, max_pasos).
+
+    Protocolo por líneas: una expresión por línea se responde con una línea
+    de texto ("= resultado" o el error); una línea con un objeto JSON
+    {"id", "expresion", "max_pasos", "variables"} se responde con
+    {"id", "resultado", "error"}. Las respuestas de una conexión salen en el
+    orden de las peticiones, aunque el cliente envíe varias sin esperar.
+    """
+
+    def __init__(self, modelo=None, max_pasos=100, tamano_cola=1024, profundidad=64):
+        self.modelo = modelo or ModeloCalculadora(verboso=False)
+        self.max_pasos = max_pasos
+        # Cola acotada hacia el motor: si se llena, las conexiones dejan de leer
+        self.pendientes = asyncio.Queue(tamano_cola)
+        # Peticiones sin responder por conexión
+        self.profundidad = profundidad
+        # Evaluaciones en curso: id -> (futuro, max_pasos), y (paso límite, id) por orden de vencimiento
+        self.en_curso = {}
+        self.vencimientos = []
+        self.paso = 0
+        # Conexiones abiertas, para esperarlas al cerrar
+        self.atendiendo = set()
+
+    async def evaluar(self, expresion, max_pasos=None, variables=None):
+        """Resultado de una expresión (None si no termina en max_pasos pasos)"""
+        futuro = asyncio.get_running_loop().create_future()
+        await self.pendientes.put((expresion, variables, self.max_pasos if max_pasos is None else max_pasos,
+                                   futuro))
+        return await futuro
+
+    async def motor(self):
+        while True:
+            if not self.en_curso:
+                self.admitir(await self.pendientes.get())
+            while not self.pendientes.empty():
+                self.admitir(self.pendientes.get_nowait())
+            self.resolver()
+
+            if self.en_curso:
+                self.modelo.step()
+                self.paso += 1
+                self.resolver()
+            # Ceder el bucle para leer y escribir en las conexiones
+            await asyncio.sleep(0)
+
+    def admitir(self, peticion):
+        expresion, variables, max_pasos, futuro = peticion
+        try:
+            id_evaluacion = self.modelo.agente_es.agregar_expresion(expresion, variables)
+        except Exception as error:
+            futuro.set_exception(error)
+            return
+        self.en_curso[id_evaluacion] = (futuro, max_pasos)
+        heapq.heappush(self.vencimientos, (self.paso + max_pasos, id_evaluacion))
+
+    def resolver(self):
+        agente_es = self.modelo.agente_es
+        for id_evaluacion in [i for i in agente_es.terminadas if i in self.en_curso]:
+            futuro, max_pasos = self.en_curso.pop(id_evaluacion)
+            resultado = agente_es.terminadas.pop(id_evaluacion).resultado_en(max_pasos)
+            if not futuro.done():
+                futuro.set_result(resultado)
+
+        # Sin resultado dentro de su presupuesto de pasos
+        while self.vencimientos and self.vencimientos[0][0] <= self.paso:
+            _, id_evaluacion = heapq.heappop(self.vencimientos)
+            futuro, _ = self.en_curso.pop(id_evaluacion, (None, None))
+            if futuro is not None:
+                agente_es.abandonar(id_evaluacion)
+                if not futuro.done():
+                    futuro.set_result(None)
+
+    async def atender(self, lector, escritor):
+        self.atendiendo.add(asyncio.current_task())
+        respuestas = asyncio.Queue(self.profundidad)
+        tarea_escritura = asyncio.create_task(self.escribir(respuestas, escritor))
+        try:
+            while True:
+                try:
+                    linea = await lector.readline()
+                except ValueError:
+                    # Línea más larga que el límite del lector: se responde y se cierra la conexión
+                    futuro = asyncio.get_running_loop().create_future()
+                    futuro.set_exception(ValueError("Petición demasiado larga"))
+                    await respuestas.put(("texto", None, futuro))
+                    break
+                if not linea:
+                    break
+                linea = linea.decode().strip()
+                if not linea:
+                    continue
+                if linea.lower() in ("salir", "exit"):
+                    break
+
+                futuro = asyncio.get_running_loop().create_future()
+                try:
+                    formato, id_peticion, peticion = self.leer_peticion(linea)
+                except PeticionInvalida as error:
+                    formato, id_peticion, peticion = "json", error.id_peticion, None
+                    futuro.set_exception(error)
+                # Con `profundidad` respuestas pendientes se deja de leer la conexión
+                await respuestas.put((formato, id_peticion, futuro))
+                if peticion is not None:
+                    await self.pendientes.put((*peticion, futuro))
+        except ConnectionError:
+            pass
+        finally:
+            await respuestas.put(None)
+            await tarea_escritura
+            escritor.close()
+            try:
+                await escritor.wait_closed()
+            except ConnectionError:
+                pass
+            self.atendiendo.discard(asyncio.current_task())
+
+    def leer_peticion(self, linea):
+        # (formato, id, (expresion, variables, max_pasos))
+        if not linea.startswith("{"):
+            return "texto", None, (linea, None, self.max_pasos)
+        try:
+            datos = json.loads(linea)
+        except json.JSONDecodeError as error:
+            raise PeticionInvalida(f"JSON inválido: {error}")
+        if not isinstance(datos, dict):
+            raise PeticionInvalida("Falta la expresión")
+        # El id se devuelve también en los errores para emparejar respuestas
+        id_peticion = datos.get("id")
+        if not isinstance(datos.get("expresion"), str):
+            raise PeticionInvalida("Falta la expresión", id_peticion)
+        max_pasos = datos.get("max_pasos", self.max_pasos)
+        if not isinstance(max_pasos, int) or max_pasos < 0:
+            raise PeticionInvalida("max_pasos debe ser un entero no negativo", id_peticion)
+        return "json", id_peticion, (datos["expresion"], datos.get("variables"), max_pasos)
+
+    async def escribir(self, respuestas, escritor):
+        conectado = True
+        while (respuesta := await respuestas.get()) is not None:
+            formato, id_peticion, futuro = respuesta
+            try:
+                resultado, error = await futuro, None
+            except Exception as excepcion:
+                resultado, error = None, excepcion
+            if not conectado:
+                continue
+            try:
+                escritor.write(self.formatear(formato, id_peticion, resultado, error).encode() + b"\n")
+                await escritor.drain()
+            except ConnectionError:
+                # El cliente se fue: se siguen esperando sus evaluaciones sin escribir
+                conectado = False
+
+    @staticmethod
+    def formatear(formato, id_peticion, resultado, error):
+        if formato == "texto":
+            if error is not None:
+                return f"Error: {error}"
+            if isinstance(resultado, str) or resultado is None:
+                return resultado or SIN_RESULTADO
+            return f"= {resultado}"
+
+        if error is None and isinstance(resultado, str) and resultado.startswith("ERROR: "):
+            resultado, error = None, resultado[len("ERROR: "):]
+        elif error is None and resultado is None:
+            error = "Sin resultado dentro de max_pasos"
+        return json.dumps({"id": id_peticion, "resultado": valor_json(resultado),
+                           "error": None if error is None else str(error)}, ensure_ascii=False)
+
+async def servir(host="127.0.0.1", puerto=8765, unix=None, servidor=None, listo=None, espera_cierre=1.0):
+    """Atender conexiones TCP (o en un socket Unix) hasta que se cancele.
+
+    Al cancelarse deja de aceptar conexiones y espera hasta espera_cierre
+    segundos a que terminen las abiertas antes de detener el motor.
+    """
+    servidor = servidor or ServidorCalculadora()
+    motor = asyncio.create_task(servidor.motor())
+    if unix:
+        conexiones = await asyncio.start_unix_server(servidor.atender, path=unix)
+    else:
+        conexiones = await asyncio.start_server(servidor.atender, host, puerto)
+    if listo is not None:
+        listo.set_result(conexiones)
+    try:
+        async with conexiones:
+            await conexiones.serve_forever()
+    finally:
+        conexiones.close()
+        if servidor.atendiendo:
+            await asyncio.wait(servidor.atendiendo, timeout=espera_cierre)
+        motor.cancel()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de la calculadora de agentes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--unix", metavar="RUTA", help="escuchar en un socket Unix en lugar de TCP")
+    parser.add_argument("--max-pasos", type=int, default=100,
+                        help="presupuesto de pasos por petición si no trae max_pasos")
+    parser.add_argument("--cola", type=int, default=1024, help="peticiones en espera hacia el modelo")
+    parser.add_argument("--profundidad", type=int, default=64,
+                        help="peticiones sin responder por conexión")
+    parser.add_argument("--trabajadores", type=int, default=1, help="agentes por operación")
+    parser.add_argument("--procesos", type=int, default=0,
+                        help="procesos entre los que se reparten los agentes de operación")
+    parser.add_argument("--optimizar", action="store_true",
+                        help="plegar constantes y compartir subárboles al compilar")
+    args = parser.parse_args(argv)
+
+    with ModeloCalculadora(verboso=False, trabajadores=args.trabajadores, procesos=args.procesos,
+                           optimizar=args.optimizar) as modelo:
+        servidor = ServidorCalculadora(modelo, args.max_pasos, args.cola, args.profundidad)
+        destino = args.unix or f"{args.host}:{args.puerto}"
+        print(f"Calculadora escuchando en {destino}")
+        try:
+            asyncio.run(servir(args.host, args.puerto, args.unix, servidor))
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
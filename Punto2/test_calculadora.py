@@ -0,0 +1,114 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from calculadora import (GrafoTareas, ModeloCalculadora, comparar_motores, compilar_expresion,
+                         evaluar_columnas, evaluar_directo, informe_optimizacion)
+
+def generar_expresiones(semilla, cantidad, hojas=("0", "1", "2", "3", "0.5", "7", "2.5", "x", "y")):
+    aleatorio = random.Random(semilla)
+
+    def generar(profundidad):
+        if profundidad == 0 or aleatorio.random() < 0.2:
+            return aleatorio.choice(hojas)
+        operacion = aleatorio.choice("+-*/^")
+        izquierda, derecha = generar(profundidad - 1), generar(profundidad - 1)
+        if operacion == "^":
+            derecha = aleatorio.choice(["0", "1", "2", "0.5", "0-1", "0-2", "x"])
+        expresion = f"{izquierda}{operacion}{derecha}"
+        return f"({expresion})" if aleatorio.random() < 0.8 else expresion
+
+    return [generar(aleatorio.randint(1, 5)) for _ in range(cantidad)]
+
+# Casos límite: errores, resultados complejos, enteros grandes y expresiones mal formadas
+CASOS = ["2+3*4", "(1/0)+(0^(0-1))", "((0-8)^0.5)+1", "10^400.0", "2^60", "1/3*3",
+         "+".join(["1"] * 20), "(2+3)*(2+3)", "(1+2)*x-(1+2)", "2 3", "(2+3", "+", ""]
+PASOS = [0, 1, 2, 3, 4, 6, 100]
+
+def como_texto(valor):
+    if isinstance(valor, Exception):
+        return f"{type(valor).__name__}: {valor}"
+    return repr(valor)
+
+def resultado(funcion, *args):
+    try:
+        return como_texto(funcion(*args))
+    except Exception as error:
+        return como_texto(error)
+
+@pytest.mark.parametrize("max_pasos", PASOS)
+def test_agentes_igual_a_directo(max_pasos):
+    for expresion in CASOS + generar_expresiones(1, 30, hojas=("0", "1", "2", "3", "0.5", "7")):
+        assert comparar_motores(expresion, max_pasos) is None
+
+@pytest.mark.parametrize("optimizar", [False, True])
+@pytest.mark.parametrize("max_pasos", PASOS)
+def test_lote_igual_a_directo(max_pasos, optimizar):
+    # Un modelo para todo el lote, con variables y con o sin optimizar al compilar
+    expresiones = [e for e in CASOS if e.strip()] + generar_expresiones(2, 60)
+    variables = {"x": 3, "y": 2.5}
+    obtenidos = ModeloCalculadora(verboso=False, optimizar=optimizar).ejecutar_lote(
+        expresiones, max_pasos, variables)
+    for expresion, obtenido in zip(expresiones, obtenidos):
+        assert como_texto(obtenido) == resultado(evaluar_directo, expresion, max_pasos, None, variables), expresion
+
+@pytest.mark.parametrize("max_pasos", PASOS)
+def test_optimizar_no_cambia_resultados(max_pasos):
+    for expresion in CASOS + generar_expresiones(3, 200):
+        for variables in ({"x": 3, "y": 2}, {"x": 0, "y": 2.5}):
+            sin_optimizar = resultado(lambda: compilar_expresion(expresion).evaluar(max_pasos, variables))
+            optimizado = resultado(lambda: compilar_expresion(expresion, True).evaluar(max_pasos, variables))
+            assert optimizado == sin_optimizar, expresion
+
+def test_informe_optimizacion():
+    informe = informe_optimizacion("(1+2)*x-(1+2)")
+    assert informe["tareas_optimizado"] < informe["tareas"]
+    assert informe["pasos_optimizado"] == informe["pasos"]
+
+def test_altura_da_los_pasos():
+    # Con 2·altura pasos hay resultado; con uno menos, todavía no
+    for expresion in ["2+3", "(2+3)*4", "+".join(["1"] * 9), "((1+2)*(3+4))^2"]:
+        pasos = 2 * compilar_expresion(expresion).altura()
+        assert evaluar_directo(expresion, pasos) is not None
+        assert evaluar_directo(expresion, pasos - 1) is None
+
+VALORES = [0.0, -0.0, 1.0, -1.0, 2.0, -2.0, 0.5, -0.5, 3.7, -3.7, 1e300, -1e300, 1e-300,
+           math.inf, -math.inf, math.nan, 1000.0, -8.0, 9007199254740993.0, 0.1]
+
+@pytest.mark.parametrize("semilla", [0, 1])
+def test_columnas_igual_a_escalar(semilla):
+    aleatorio = random.Random(semilla)
+    columna = lambda: np.array([aleatorio.choice(VALORES) if aleatorio.random() < 0.6
+                                else aleatorio.uniform(-10, 10) for _ in range(150)])
+    x, y = columna(), columna()
+    hojas = ("x", "y", "x", "y", "0", "1", "2", "0.5", "7", "0.1", "9007199254740993")
+    expresiones = ["x", "x^2", "x^3", "x^0.5", "x^y", "x*x-y^2"] + generar_expresiones(semilla, 80, hojas)
+    for expresion in expresiones:
+        max_pasos = aleatorio.choice([100, 4, 6])
+        try:
+            columnas = evaluar_columnas(expresion, {"x": x, "y": y}, max_pasos)
+        except Exception as error:
+            with pytest.raises(type(error)):
+                evaluar_directo(expresion, max_pasos, variables={"x": x[0], "y": y[0]})
+            continue
+        if np.ndim(columnas.valores) == 0:
+            # Sin variables el resultado es un escalar (arreglo de dimensión 0)
+            assert repr(columnas.escalar(())) == resultado(evaluar_directo, expresion, max_pasos)
+            continue
+        for i in range(len(x)):
+            esperado = resultado(evaluar_directo, expresion, max_pasos, None,
+                                 {"x": x[i].item(), "y": y[i].item()})
+            assert repr(columnas.escalar(i)) == esperado, (expresion, x[i], y[i])
+
+def test_potencia_rapida_igual_a_pow():
+    generador = np.random.default_rng(0)
+    a = np.concatenate([generador.uniform(-1e3, 1e3, 200000), generador.integers(1, 50, 2000) * generador.choice([-1.0, 1.0], 2000)])
+    for exponente in (2.0, 3.0, 7.0, 25.0):
+        b = np.full(a.shape, exponente)
+        normales = np.abs(b * np.log2(np.abs(a))) <= 1000
+        rapidos, valores = GrafoTareas._potencia_rapida(a, b, normales, a.shape)
+        # Enteros exactos con cualquier exponente; cuadrados también con base no entera
+        assert rapidos[-2000:].any() and (exponente != 2 or rapidos[:-2000].mean() > 0.8)
+        assert valores[rapidos].tolist() == [x ** exponente for x in a[rapidos].tolist()]
@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+import pytest
+
+from calculadora import evaluar_directo
+from servidor import PeticionInvalida, ServidorCalculadora, servir
+
+@pytest.mark.parametrize("linea, id_peticion", [
+    ('{"id": 7}', 7),
+    ('{"id": "a", "expresion": "2+3", "max_pasos": -1}', "a"),
+    ('{}', None),
+    ('{"id": 7', None),
+])
+def test_peticion_invalida_conserva_el_id(linea, id_peticion):
+    with pytest.raises(PeticionInvalida) as error:
+        ServidorCalculadora().leer_peticion(linea)
+    assert error.value.id_peticion == id_peticion
+
+def test_respuestas_en_orden_y_como_el_modo_directo():
+    expresiones = ["2+3*4", "1/0", "((0-8)^0.5)+1", "(2+3", "+".join(["1"] * 60), "2^0.5"]
+
+    async def cliente(puerto):
+        lector, escritor = await asyncio.open_connection("127.0.0.1", puerto)
+        for i, expresion in enumerate(expresiones):
+            escritor.write((json.dumps({"id": i, "expresion": expresion}) + "\n").encode())
+        escritor.write(b'{"id": "x"}\n2+3\n')
+        await escritor.drain()
+        respuestas = [json.loads(await lector.readline()) for _ in range(len(expresiones) + 1)]
+        texto = (await lector.readline()).decode().strip()
+        escritor.close()
+        return respuestas, texto
+
+    async def principal():
+        listo = asyncio.get_running_loop().create_future()
+        tarea = asyncio.create_task(servir(puerto=0, listo=listo, espera_cierre=0.1))
+        conexiones = await listo
+        try:
+            return await cliente(conexiones.sockets[0].getsockname()[1])
+        finally:
+            tarea.cancel()
+            await asyncio.gather(tarea, return_exceptions=True)
+
+    respuestas, texto = asyncio.run(principal())
+    assert [r["id"] for r in respuestas] == [*range(len(expresiones)), "x"]
+    for expresion, respuesta in zip(expresiones, respuestas):
+        try:
+            esperado = evaluar_directo(expresion)
+        except Exception:
+            assert respuesta["resultado"] is None and respuesta["error"]
+            continue
+        if isinstance(esperado, str):
+            assert respuesta["error"] == esperado[len("ERROR: "):]
+        else:
+            assert respuesta["resultado"] == (str(esperado) if isinstance(esperado, complex) else esperado)
+    assert respuestas[-1]["error"] == "Falta la expresión"
+    assert texto == "= 5"